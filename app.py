@@ -4,6 +4,7 @@ os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'  # Suppress TF logging
 os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'  # Disable oneDNN custom operations
 import streamlit as st
 from modules.themes import apply_default_theme
+from modules.emotion_detector import start_hf_warmup
 
 def main():
     # Page configuration with enhanced settings
@@ -32,6 +33,9 @@ def main():
     # Apply default theme
     apply_default_theme()
     
+    # Start loading the remote text model before anyone needs it
+    start_hf_warmup()
+    
     # Main landing page content
     st.markdown("""
         <div style='text-align: center; padding: 2rem 0;'>
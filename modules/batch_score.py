@@ -0,0 +1,222 @@
+"""
+Offline batch scoring of face emotions for an image directory or tar archive.
+
+Usage (from the repo root):
+    python -m modules.batch_score path/to/images scores.jsonl
+    python -m modules.batch_score photos.tar.gz scores/ --format parquet --workers 8
+
+Images are scored on a pool of worker processes, each with its own warm
+models, and results stream to JSONL (one object per line) or to a directory
+of Parquet part files. Re-running with the same output resumes: images that
+already have a result are skipped.
+"""
+import os
+import sys
+import json
+import time
+import glob
+import tarfile
+import argparse
+import logging
+from collections import deque
+
+from modules.emotion_detector import (
+    EMOTION_BACKENDS,
+    FACE_DETECTOR_BACKENDS,
+    InferencePool,
+    TF_INTER_THREADS,
+    TF_INTRA_THREADS,
+)
+
+logger = logging.getLogger('vibefy')
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+def iter_directory(root):
+    """Yield (relative path, bytes) for every image below `root`, in sorted order"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                path = os.path.join(dirpath, name)
+                with open(path, 'rb') as f:
+                    yield os.path.relpath(path, root), f.read()
+
+
+def iter_tar(path):
+    """Yield (member name, bytes) for every image in a (possibly compressed) tar, streaming"""
+    with tarfile.open(path, 'r|*') as archive:
+        for member in archive:
+            if member.isfile() and member.name.lower().endswith(IMAGE_EXTENSIONS):
+                f = archive.extractfile(member)
+                if f is not None:
+                    yield member.name, f.read()
+
+
+class JsonlWriter:
+    def __init__(self, path):
+        self.path = path
+
+    def done(self):
+        """Image names already scored (a truncated last line is ignored)"""
+        names = set()
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        names.add(json.loads(line)["image"])
+                    except (ValueError, KeyError):
+                        continue
+        return names
+
+    def __enter__(self):
+        needs_newline = False
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            with open(self.path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b'\n'
+        self._file = open(self.path, 'a', encoding='utf-8')
+        if needs_newline:
+            self._file.write('\n')
+        return self
+
+    def write(self, record):
+        self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+
+    def __exit__(self, *exc):
+        self._file.close()
+
+
+class ParquetWriter:
+    """Writes records to numbered part files in a directory, `chunk_size` rows per file"""
+
+    def __init__(self, path, chunk_size=1000):
+        self.path = path
+        self.chunk_size = chunk_size
+        self._rows = []
+
+    def _parts(self):
+        return sorted(glob.glob(os.path.join(self.path, 'part-*.parquet')))
+
+    def done(self):
+        import pyarrow.parquet as pq
+        names = set()
+        for part in self._parts():
+            names.update(pq.read_table(part, columns=['image']).column('image').to_pylist())
+        return names
+
+    def __enter__(self):
+        os.makedirs(self.path, exist_ok=True)
+        self._next_part = len(self._parts())
+        return self
+
+    def write(self, record):
+        self._rows.append(record)
+        if len(self._rows) >= self.chunk_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._rows:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        part = os.path.join(self.path, f'part-{self._next_part:05d}.parquet')
+        pq.write_table(pa.Table.from_pylist(self._rows), part)
+        self._next_part += 1
+        self._rows = []
+
+    def __exit__(self, *exc):
+        self._flush()
+
+
+def to_record(name, future):
+    """Turn a finished scoring job into an output row"""
+    record = {"image": name, "mood": None, "confidence": None, "probabilities": None,
+              "seconds": None, "error": None}
+    try:
+        result, seconds = future.result()
+        probabilities = result.get("probabilities")
+        record.update(
+            mood=result["mood"],
+            confidence=result["confidence"],
+            probabilities=[float(p) for p in probabilities] if probabilities is not None else None,
+            seconds=round(seconds, 4),
+        )
+    except Exception as e:
+        logger.exception(f"Scoring failed for {name}")
+        record["error"] = str(e)
+    return record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score face emotions for a directory or tar archive of images")
+    parser.add_argument("source", help="Image directory or .tar/.tar.gz archive")
+    parser.add_argument("output", help="JSONL file, or directory for --format parquet")
+    parser.add_argument("--format", choices=("jsonl", "parquet"), default="jsonl")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--intra-threads", type=int, default=TF_INTRA_THREADS)
+    parser.add_argument("--inter-threads", type=int, default=TF_INTER_THREADS)
+    parser.add_argument("--detector", choices=FACE_DETECTOR_BACKENDS, default=None)
+    parser.add_argument("--emotion-backend", choices=EMOTION_BACKENDS, default=None)
+    parser.add_argument("--max-in-flight", type=int, default=None,
+                        help="Images queued at once (default 4 per worker)")
+    args = parser.parse_args(argv)
+
+    if os.path.isdir(args.source):
+        source = iter_directory(args.source)
+    elif tarfile.is_tarfile(args.source):
+        source = iter_tar(args.source)
+    else:
+        print(f"{args.source} is neither a directory nor a tar archive")
+        return 1
+
+    writer = JsonlWriter(args.output) if args.format == "jsonl" else ParquetWriter(args.output)
+    done = writer.done()
+    if done:
+        print(f"Resuming: {len(done)} image(s) already scored")
+
+    pool = InferencePool(workers=args.workers, intra_threads=args.intra_threads,
+                         inter_threads=args.inter_threads, detector=args.detector,
+                         emotion_backend=args.emotion_backend)
+    max_in_flight = args.max_in_flight or args.workers * 4
+
+    scored = skipped = errors = 0
+    start = time.perf_counter()
+    in_flight = deque()
+    try:
+        with writer:
+            def write_oldest():
+                nonlocal scored, errors
+                name, future = in_flight.popleft()
+                record = to_record(name, future)
+                writer.write(record)
+                scored += 1
+                errors += record["error"] is not None
+                if scored % 100 == 0:
+                    elapsed = time.perf_counter() - start
+                    print(f"{scored} scored, {scored / elapsed:.1f} images/s")
+
+            for name, data in source:
+                if name in done:
+                    skipped += 1
+                    continue
+                in_flight.append((name, pool.submit_bytes(data)))
+                # Bound memory: never hold more than max_in_flight encoded images
+                while len(in_flight) >= max_in_flight:
+                    write_oldest()
+            while in_flight:
+                write_oldest()
+    finally:
+        pool.shutdown()
+
+    elapsed = time.perf_counter() - start
+    rate = scored / elapsed if elapsed > 0 else 0.0
+    print(f"Scored {scored} image(s) ({errors} error(s), {skipped} skipped) in {elapsed:.1f}s "
+          f"= {rate:.1f} images/s on {args.workers} worker(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
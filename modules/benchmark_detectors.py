@@ -0,0 +1,143 @@
+"""
+Compare face detector backends on a local image set.
+
+Usage (from the repo root):
+    python -m modules.benchmark_detectors path/to/images --backends haar mtcnn opencv_dnn
+
+For every backend this reports p50/p95 wall-clock latency, CPU time per image,
+face hit rate and agreement with the reference backend (same face box with
+IoU >= 0.5, and same predicted mood).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+
+import cv2
+import numpy as np
+
+from modules.emotion_detector import (
+    FACE_DETECTOR_BACKENDS,
+    detect_batch,
+    get_face_detector,
+    locate_faces,
+)
+
+logger = logging.getLogger('vibefy')
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+def load_images(image_dir):
+    """Load every readable image in a directory as (name, BGR ndarray) pairs"""
+    images = []
+    for name in sorted(os.listdir(image_dir)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        img = cv2.imread(os.path.join(image_dir, name))
+        if img is None:
+            logger.warning(f"Skipping unreadable image: {name}")
+            continue
+        images.append((name, img))
+    return images
+
+
+def box_iou(a, b):
+    """Intersection over union of two (x, y, w, h) boxes"""
+    ax2, ay2 = a[0] + a[2], a[1] + a[3]
+    bx2, by2 = b[0] + b[2], b[1] + b[3]
+    inter_w = max(0, min(ax2, bx2) - max(a[0], b[0]))
+    inter_h = max(0, min(ay2, by2) - max(a[1], b[1]))
+    inter = inter_w * inter_h
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+
+def run_backend(backend, images, repeat=1):
+    """Time one backend over the image set; returns per-image boxes, moods and timings"""
+    get_face_detector(backend)  # warm the model so load time isn't counted
+
+    latencies, cpu_times, boxes, moods = [], [], [], []
+    for name, img in images:
+        rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        for _ in range(repeat):
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+            found = locate_faces(rgb, detector=backend)
+            latencies.append(time.perf_counter() - wall_start)
+            cpu_times.append(time.process_time() - cpu_start)
+        boxes.append(max(found, key=lambda b: b[2] * b[3]) if found else None)
+        moods.append(detect_batch([img], detector=backend)[0]["mood"])
+    return {"latencies": latencies, "cpu_times": cpu_times, "boxes": boxes, "moods": moods}
+
+
+def summarize(backend, run, reference=None):
+    latencies_ms = np.array(run["latencies"]) * 1000
+    cpu_ms = np.array(run["cpu_times"]) * 1000
+    hits = [box is not None for box in run["boxes"]]
+    summary = {
+        "backend": backend,
+        "images": len(run["boxes"]),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 1),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 1),
+        "cpu_ms_per_image": round(float(cpu_ms.mean()), 1),
+        "face_hit_rate": round(sum(hits) / len(hits), 3),
+    }
+    if reference is not None:
+        box_agree = [
+            (a is None and b is None) or (a is not None and b is not None and box_iou(a, b) >= 0.5)
+            for a, b in zip(run["boxes"], reference["boxes"])
+        ]
+        mood_agree = [a == b for a, b in zip(run["moods"], reference["moods"])]
+        summary["box_agreement"] = round(sum(box_agree) / len(box_agree), 3)
+        summary["mood_agreement"] = round(sum(mood_agree) / len(mood_agree), 3)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Vibefy face detector backends")
+    parser.add_argument("image_dir", help="Directory of test images")
+    parser.add_argument("--backends", nargs="+", default=list(FACE_DETECTOR_BACKENDS),
+                        choices=FACE_DETECTOR_BACKENDS)
+    parser.add_argument("--reference", default="mtcnn", choices=FACE_DETECTOR_BACKENDS,
+                        help="Backend treated as ground truth for agreement")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per image")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    images = load_images(args.image_dir)
+    if not images:
+        print(f"No images found in {args.image_dir}")
+        return 1
+
+    backends = list(args.backends)
+    if args.reference not in backends:
+        backends.insert(0, args.reference)
+
+    runs = {}
+    for backend in backends:
+        try:
+            runs[backend] = run_backend(backend, images, args.repeat)
+        except Exception as e:
+            logger.exception(f"Backend {backend} failed")
+            print(f"Skipping {backend}: {e}")
+
+    reference = runs.get(args.reference)
+    summaries = [summarize(b, runs[b], reference if b != args.reference else None) for b in runs]
+
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+    else:
+        print(f"{len(images)} image(s), {args.repeat} timed run(s) each, reference: {args.reference}")
+        for s in summaries:
+            agreement = ""
+            if "box_agreement" in s:
+                agreement = f"  box agree {s['box_agreement']:.0%}  mood agree {s['mood_agreement']:.0%}"
+            print(f"{s['backend']:<11} p50 {s['p50_ms']:>7.1f} ms  p95 {s['p95_ms']:>7.1f} ms  "
+                  f"cpu {s['cpu_ms_per_image']:>7.1f} ms  faces {s['face_hit_rate']:.0%}{agreement}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+Measure the per-request latency saved by the pooled HuggingFace HTTP session.
+
+Usage (from the repo root):
+    python -m modules.benchmark_http --requests 200 --delay-ms 20
+    python -m modules.benchmark_http --url https://api-inference.huggingface.co/models/... --token $HF_TOKEN
+
+By default a local stand-in server answers like the HuggingFace inference
+API after `--delay-ms`, so the difference between the two modes is the
+connection setup alone. A fresh `requests.post` per call (the old behaviour)
+is compared with the shared keep-alive session used by analyze_text.
+"""
+import sys
+import json
+import time
+import argparse
+import threading
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import requests
+
+from modules.emotion_detector import HF_CONNECT_TIMEOUT, HF_READ_TIMEOUT, close_http_session, get_http_session
+
+logger = logging.getLogger('vibefy')
+
+STAND_IN_SCORES = [
+    {"label": "joy", "score": 0.91},
+    {"label": "surprise", "score": 0.04},
+    {"label": "neutral", "score": 0.02},
+]
+
+
+class StandInServer:
+    """
+    Local HTTP/1.1 server that answers every POST like the HF inference API:
+    one list of label scores per input, for single inputs and batches alike
+    """
+
+    def __init__(self, delay=0.0):
+        delay_seconds = delay
+        stats = self.stats = {"requests": 0, "connections": 0}
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive
+
+            def setup(self):
+                super().setup()
+                stats["connections"] += 1
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                inputs = payload.get("inputs")
+                count = len(inputs) if isinstance(inputs, list) else 1
+                stats["requests"] += 1
+                if delay_seconds:
+                    time.sleep(delay_seconds)
+                body = json.dumps([STAND_IN_SCORES] * count).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}/models/stand-in"
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def time_requests(post, url, headers, count):
+    """Latency of `count` sequential POSTs made with `post` (requests.post or session.post)"""
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = post(url, headers=headers, json={"inputs": "I'm so happy today!"},
+                        timeout=(HF_CONNECT_TIMEOUT, HF_READ_TIMEOUT))
+        response.raise_for_status()
+        response.json()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def summarize(mode, latencies):
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "mode": mode,
+        "requests": len(latencies),
+        "mean_ms": round(float(latencies_ms.mean()), 2),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 2),
+    }
+
+
+def run(url, headers, count):
+    summaries = [summarize("fresh connection", time_requests(requests.post, url, headers, count))]
+    close_http_session()
+    session = get_http_session()
+    time_requests(session.post, url, headers, 1)  # open the pooled connection before timing
+    summaries.append(summarize("pooled session", time_requests(session.post, url, headers, count)))
+    return summaries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare fresh vs pooled HTTP connections for text analysis")
+    parser.add_argument("--url", default=None, help="Endpoint to call (default: local stand-in server)")
+    parser.add_argument("--token", default=None, help="Bearer token for --url")
+    parser.add_argument("--requests", type=int, default=100, help="Timed requests per mode")
+    parser.add_argument("--delay-ms", type=float, default=0.0, help="Stand-in server think time")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    if args.url:
+        summaries = run(args.url, headers, args.requests)
+    else:
+        with StandInServer(delay=args.delay_ms / 1000.0) as server:
+            summaries = run(server.url, headers, args.requests)
+            logger.info(f"Stand-in server stats: {server.stats}")
+
+    saved = summaries[0]["mean_ms"] - summaries[1]["mean_ms"]
+    if args.json:
+        print(json.dumps({"modes": summaries, "saved_ms_per_request": round(saved, 2)}, indent=2))
+    else:
+        for s in summaries:
+            print(f"{s['mode']:<17} mean {s['mean_ms']:>8.2f} ms  p50 {s['p50_ms']:>8.2f} ms  "
+                  f"p95 {s['p95_ms']:>8.2f} ms")
+        print(f"Saved per request: {saved:.2f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Measure text analysis throughput (texts/s) for different batch sizes.
+
+Usage (from the repo root):
+    python -m modules.benchmark_text --batch-sizes 1 8 32 --texts 512
+    python -m modules.benchmark_text chats.txt --backend local --batch-sizes 1 16 64
+
+Texts come from a file (one per line) or are generated. The api backend
+talks to a local stand-in server unless --live is given (then HF_TOKEN and
+VIBEFY_HF_API_URL apply). Batch size 1 is the old one-call-per-text path.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import logging
+
+import modules.emotion_detector as emotion_detector
+from modules.benchmark_http import StandInServer
+
+logger = logging.getLogger('vibefy')
+
+SAMPLE_TEXTS = (
+    "I'm so happy today!",
+    "I feel really sad and alone",
+    "This makes me so angry!",
+    "I'm worried about tomorrow",
+    "Just feeling normal",
+    "Wow, I did not expect that at all",
+    "That smell is revolting",
+)
+
+
+def load_texts(path, count):
+    if path:
+        with open(path, encoding='utf-8') as f:
+            texts = [line.rstrip('\n') for line in f]
+        return texts[:count] if count else texts
+    return list(itertools.islice(itertools.cycle(SAMPLE_TEXTS), count or 256))
+
+
+def run(texts, backend, batch_sizes):
+    results = []
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        emotion_detector.analyze_texts(texts, batch_size=batch_size, backend=backend, use_cache=False,
+                                       use_lexicon=False)
+        elapsed = time.perf_counter() - start
+        results.append({
+            "backend": backend,
+            "batch_size": batch_size,
+            "texts": len(texts),
+            "seconds": round(elapsed, 3),
+            "texts_per_second": round(len(texts) / elapsed, 1) if elapsed > 0 else None,
+        })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark batched text emotion analysis")
+    parser.add_argument("source", nargs="?", default=None, help="Text file, one input per line")
+    parser.add_argument("--texts", type=int, default=None, help="Number of texts (default: all / 256)")
+    parser.add_argument("--backend", choices=emotion_detector.TEXT_BACKENDS, default="api")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--delay-ms", type=float, default=20.0, help="Stand-in server time per request")
+    parser.add_argument("--live", action="store_true", help="Call the real API instead of a stand-in")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    texts = load_texts(args.source, args.texts)
+    if not texts:
+        print("No texts to score")
+        return 1
+
+    if args.backend == "local":
+        emotion_detector.analyze_texts(texts[:1], backend="local")  # load the model before timing
+    if args.backend == "api" and not args.live:
+        with StandInServer(delay=args.delay_ms / 1000.0) as server:
+            emotion_detector.HF_API_URL = server.url
+            os.environ.setdefault("HF_TOKEN", "stand-in")
+            results = run(texts, args.backend, args.batch_sizes)
+    else:
+        results = run(texts, args.backend, args.batch_sizes)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for r in results:
+            print(f"{r['backend']:<6} batch {r['batch_size']:>4}  {r['texts']} text(s) in {r['seconds']:>7.3f}s  "
+                  f"= {r['texts_per_second']:>8.1f} texts/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""
+Sweep inference threading settings and report throughput against latency.
+
+Usage (from the repo root):
+    python -m modules.benchmark_threads path/to/images --workers 1 2 4 8 --intra 1 2 4 --pin
+
+For every (workers, intra-op threads) combination an InferencePool is started,
+warmed up, and then given every image in the folder `--rounds` times at once.
+Throughput is images/s over the whole run; latency is per image, from submit
+to result, so it includes queueing when the pool is oversubscribed.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import logging
+
+import numpy as np
+
+from modules.emotion_detector import EMOTION_BACKENDS, FACE_DETECTOR_BACKENDS, InferencePool
+
+logger = logging.getLogger('vibefy')
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+def load_encoded_images(image_dir):
+    images = []
+    for name in sorted(os.listdir(image_dir)):
+        if name.lower().endswith(IMAGE_EXTENSIONS):
+            with open(os.path.join(image_dir, name), 'rb') as f:
+                images.append(f.read())
+    return images
+
+
+def run_setting(images, workers, intra_threads, inter_threads, rounds, pin, detector, emotion_backend):
+    pool = InferencePool(workers=workers, intra_threads=intra_threads, inter_threads=inter_threads,
+                         detector=detector, emotion_backend=emotion_backend, pin_cpus=pin)
+    try:
+        # Warm every worker (process start-up and model loading aren't measured)
+        for future in [pool.submit_bytes(images[0]) for _ in range(workers * 2)]:
+            future.result()
+
+        finished_at = {}
+
+        def record_finish(future):
+            finished_at[id(future)] = time.perf_counter()
+
+        start = time.perf_counter()
+        jobs = []
+        for data in images * rounds:
+            submitted = time.perf_counter()
+            future = pool.submit_bytes(data)
+            future.add_done_callback(record_finish)
+            jobs.append((submitted, future))
+        for _, future in jobs:
+            future.result()
+        elapsed = time.perf_counter() - start
+        # Callbacks may still be running for the last futures, so read the times after result()
+        latencies = [finished_at.get(id(future), start + elapsed) - submitted for submitted, future in jobs]
+    finally:
+        pool.shutdown()
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "workers": workers,
+        "intra_threads": intra_threads,
+        "inter_threads": inter_threads,
+        "pinned": pin,
+        "images": len(jobs),
+        "images_per_second": round(len(jobs) / elapsed, 2),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 1),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep Vibefy inference threading settings")
+    parser.add_argument("image_dir", help="Directory of test images")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--intra", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--inter", type=int, default=1)
+    parser.add_argument("--rounds", type=int, default=3, help="Times each image is submitted")
+    parser.add_argument("--pin", action="store_true", help="Pin each worker to its own CPUs")
+    parser.add_argument("--detector", choices=FACE_DETECTOR_BACKENDS, default=None)
+    parser.add_argument("--emotion-backend", choices=EMOTION_BACKENDS, default=None)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    images = load_encoded_images(args.image_dir)
+    if not images:
+        print(f"No images found in {args.image_dir}")
+        return 1
+
+    results = []
+    for workers, intra in itertools.product(args.workers, args.intra):
+        if workers * intra > (os.cpu_count() or 1) * 2:
+            print(f"Skipping {workers} worker(s) x {intra} thread(s): more than 2x oversubscribed")
+            continue
+        result = run_setting(images, workers, intra, args.inter, args.rounds, args.pin,
+                             args.detector, args.emotion_backend)
+        results.append(result)
+        if not args.json:
+            print(f"workers {workers:>2}  intra {intra:>2}  {result['images_per_second']:>8.2f} img/s  "
+                  f"p50 {result['p50_ms']:>8.1f} ms  p95 {result['p95_ms']:>8.1f} ms")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
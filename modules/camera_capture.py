@@ -0,0 +1,255 @@
+import time
+import threading
+import logging
+from collections import deque
+
+logger = logging.getLogger('vibefy')
+
+# Supported drop policies for a full ring buffer
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+
+
+class FrameRingBuffer:
+    """
+    Bounded, thread-safe buffer of (timestamp, frame) items.
+    When full, either the oldest item is evicted (drop_oldest) or the incoming
+    item is discarded (drop_newest). Push/drop counts are kept for tuning.
+    """
+
+    def __init__(self, maxlen=2, drop_policy=DROP_OLDEST):
+        if maxlen < 1:
+            raise ValueError("maxlen must be at least 1")
+        if drop_policy not in (DROP_OLDEST, DROP_NEWEST):
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.maxlen = maxlen
+        self.drop_policy = drop_policy
+        self._items = deque()
+        self._cond = threading.Condition()
+        self.pushed = 0
+        self.dropped = 0
+        self.high_water = 0
+
+    def put(self, item):
+        """Add an item; returns False if it (or an older item) had to be dropped"""
+        with self._cond:
+            self.pushed += 1
+            accepted = True
+            if len(self._items) >= self.maxlen:
+                self.dropped += 1
+                if self.drop_policy == DROP_NEWEST:
+                    return False
+                self._items.popleft()
+                accepted = False
+            self._items.append(item)
+            self.high_water = max(self.high_water, len(self._items))
+            self._cond.notify_all()
+            return accepted
+
+    def latest(self):
+        """Most recent item without removing it (None if empty)"""
+        with self._cond:
+            return self._items[-1] if self._items else None
+
+    def drain(self, max_items=None, timeout=None):
+        """
+        Remove and return up to max_items items, oldest first. Waits up to
+        `timeout` seconds for at least one item when the buffer is empty.
+        """
+        with self._cond:
+            if not self._items and timeout:
+                self._cond.wait(timeout)
+            count = len(self._items) if max_items is None else min(max_items, len(self._items))
+            return [self._items.popleft() for _ in range(count)]
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "depth": len(self._items),
+                "capacity": self.maxlen,
+                "high_water": self.high_water,
+                "pushed": self.pushed,
+                "dropped": self.dropped,
+                "drop_policy": self.drop_policy,
+            }
+
+
+class CameraCapture:
+    """
+    Grabs webcam frames on a dedicated thread. Every frame goes into a small
+    preview buffer, and one frame every `sample_interval` seconds (up to
+    `max_samples`) goes into the sample buffer consumed by an InferenceWorker.
+    """
+
+    def __init__(self, device=0, width=640, height=480, fps=30, resize=(400, 300),
+                 buffer_size=2, drop_policy=DROP_OLDEST,
+                 sample_interval=0.5, max_samples=10, sample_queue_depth=10,
+                 sample_drop_policy=DROP_OLDEST):
+        self.device = device
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.resize = resize
+        self.sample_interval = sample_interval
+        self.max_samples = max_samples
+        self.frames = FrameRingBuffer(buffer_size, drop_policy)
+        self.samples = FrameRingBuffer(sample_queue_depth, sample_drop_policy)
+        self.error = None
+        self.frames_grabbed = 0
+        self.samples_taken = 0
+        self.measured_fps = 0.0
+        self._cap = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """Open the camera and start the grabber thread; returns False if the camera can't be opened"""
+        import cv2
+        self._cap = cv2.VideoCapture(self.device)
+        if not self._cap.isOpened():
+            logger.error("Failed to open webcam")
+            self._cap.release()
+            self._cap = None
+            return False
+
+        logger.debug("Webcam opened successfully")
+        self._cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        self._cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        self._cap.set(cv2.CAP_PROP_FPS, self.fps)
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="vibefy-camera-grabber", daemon=True)
+        self._thread.start()
+        return True
+
+    def _run(self):
+        import cv2
+        started = time.time()
+        last_sample = 0.0
+        try:
+            while not self._stop.is_set():
+                ret, frame = self._cap.read()
+                if not ret:
+                    self.error = "Failed to capture frame from camera"
+                    logger.error(self.error)
+                    break
+
+                if self.resize:
+                    frame = cv2.resize(frame, self.resize)
+                now = time.time()
+                self.frames.put((now, frame))
+                self.frames_grabbed += 1
+                elapsed = now - started
+                if elapsed > 0:
+                    self.measured_fps = self.frames_grabbed / elapsed
+
+                # Sampling runs on the grabber clock, so slow inference can't skew it
+                if (self.sample_interval is not None and self.samples_taken < self.max_samples
+                        and now - last_sample >= self.sample_interval):
+                    self.samples.put((now, frame))
+                    self.samples_taken += 1
+                    last_sample = now
+        except Exception as e:
+            self.error = str(e)
+            logger.exception("Camera grabber thread failed")
+
+    def latest_frame(self):
+        """Most recent BGR frame for preview (None until the first frame arrives)"""
+        item = self.frames.latest()
+        return item[1] if item else None
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+        logger.info(f"Camera capture stopped: {self.stats()}")
+
+    def stats(self):
+        return {
+            "frames_grabbed": self.frames_grabbed,
+            "measured_fps": round(self.measured_fps, 1),
+            "samples_taken": self.samples_taken,
+            "frame_buffer": self.frames.stats(),
+            "sample_buffer": self.samples.stats(),
+        }
+
+
+class InferenceWorker:
+    """
+    Consumes sampled frames from a FrameRingBuffer on its own thread and runs
+    `detect_fn` (e.g. detect_batch) over up to `batch_size` frames at a time.
+    Results are kept as (timestamp, result) pairs in sampling order.
+    """
+
+    def __init__(self, samples, detect_fn, batch_size=5):
+        self.samples = samples
+        self.detect_fn = detect_fn
+        self.batch_size = batch_size
+        self.batches = 0
+        self.frames_processed = 0
+        self.inference_seconds = 0.0
+        self._results = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="vibefy-inference-worker", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            items = self.samples.drain(self.batch_size, timeout=0.1)
+            if not items:
+                if self._stop.is_set():
+                    break
+                continue
+            self._process(items)
+
+    def _process(self, items):
+        try:
+            start = time.perf_counter()
+            results = self.detect_fn([frame for _, frame in items])
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._results.extend((ts, result) for (ts, _), result in zip(items, results))
+                self.batches += 1
+                self.frames_processed += len(items)
+                self.inference_seconds += elapsed
+            logger.debug(f"Inference worker processed {len(items)} frame(s) in {elapsed:.2f}s")
+        except Exception:
+            logger.exception("Inference worker failed on a batch")
+
+    def stop(self, timeout=None, drain=True):
+        """Stop once every queued sample has been processed (or discard them with drain=False)"""
+        if not drain:
+            discarded = self.samples.drain()
+            if discarded:
+                logger.debug(f"Inference worker discarded {len(discarded)} pending sample(s)")
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        logger.info(f"Inference worker stopped: {self.stats()}")
+
+    def results(self):
+        with self._lock:
+            return [result for _, result in self._results]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "frames_processed": self.frames_processed,
+                "inference_seconds": round(self.inference_seconds, 3),
+                "pending": len(self.samples),
+            }
@@ -1,25 +1,58 @@
 import os
-import cv2
-import requests
-from fer import FER
-from dotenv import load_dotenv
 import logging
 import sys
+import importlib
+import time
+import threading
+import asyncio
+import atexit
+import json
+import hashlib
+import sqlite3
+import queue
+import random
+import re
+from collections import OrderedDict
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 import numpy as np
+from dotenv import load_dotenv
 from datetime import datetime
 
-# Set up logging with more detailed configuration
-log_formatter = logging.Formatter('%(asctime)s UTC - %(levelname)s - %(message)s')
-log_file = 'vibefy_debug.log'
-file_handler = logging.FileHandler(log_file, mode='a', encoding='utf-8')
-file_handler.setFormatter(log_formatter)
-console_handler = logging.StreamHandler(sys.stdout)
-console_handler.setFormatter(log_formatter)
+class _LazyModule:
+    """
+    Stand-in for a heavy module that is only imported on first attribute
+    access, so importing this module (and the pages) stays cheap.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            start = time.perf_counter()
+            self._module = importlib.import_module(self._name)
+            logger.debug(f"Imported {self._name} on first use in {time.perf_counter() - start:.2f}s")
+        return getattr(self._module, attr)
 
+# cv2 and requests are imported on first real use; fer/TensorFlow are only
+# imported inside the loaders that need them
+cv2 = _LazyModule('cv2')
+requests = _LazyModule('requests')
+
+# Set up logging with more detailed configuration (once, even if re-imported)
 logger = logging.getLogger('vibefy')
+if not logger.handlers:
+    log_formatter = logging.Formatter('%(asctime)s UTC - %(levelname)s - %(message)s')
+    log_file = 'vibefy_debug.log'
+    file_handler = logging.FileHandler(log_file, mode='a', encoding='utf-8')
+    file_handler.setFormatter(log_formatter)
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(log_formatter)
+    logger.addHandler(file_handler)
+    logger.addHandler(console_handler)
 logger.setLevel(logging.DEBUG)  # Set to DEBUG for more detailed logs
-logger.addHandler(file_handler)
-logger.addHandler(console_handler)
 
 # Suppress TensorFlow warnings
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
@@ -29,6 +62,9 @@ os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
 logger.info(f"Emotion detector module initialized by user: {os.getenv('USERNAME', 'unknown')}")
 logger.info(f"Current UTC time: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}")
 
+# python-dotenv is cheap to import. Loading .env here makes it available to the
+# whole process (the music page reads YOUTUBE_API_KEY from it) and lets it set
+# the VIBEFY_* options read below.
 load_dotenv()
 
 # Emotion label mapping for consistency across all detection methods
@@ -42,6 +78,114 @@ EMOTION_MAPPING = {
     'neutral': 'neutral'
 }
 
+# Output order of FER's emotion classifier
+FER_EMOTION_LABELS = ('angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral')
+
+# App emotion labels in classifier order (EMOTION_MAPPING applied)
+MOOD_LABELS = ('anger', 'disgust', 'fear', 'joy', 'sadness', 'surprise', 'neutral')
+
+# Face crop geometry used by FER before classification
+FACE_OFFSETS = (10, 10)
+FACE_PADDING = 40
+
+# Face detector backends: FER's Haar cascade, FER's MTCNN and OpenCV's
+# ResNet-10 SSD (model files are not bundled with opencv-python)
+FACE_DETECTOR_BACKENDS = ('haar', 'mtcnn', 'opencv_dnn')
+DEFAULT_FACE_DETECTOR = os.getenv('VIBEFY_FACE_DETECTOR', 'mtcnn')
+DNN_FACE_MODEL_DIR = os.getenv('VIBEFY_DNN_FACE_MODEL_DIR', os.path.join('models', 'face_detector'))
+DNN_FACE_CONFIDENCE = float(os.getenv('VIBEFY_DNN_FACE_CONFIDENCE', '0.5'))
+
+# Emotion classifier backends: FER's Keras model, or the same model exported
+# to ONNX and run with ONNX Runtime / cv2.dnn (no TensorFlow import)
+EMOTION_BACKENDS = ('keras', 'onnx', 'opencv')
+DEFAULT_EMOTION_BACKEND = os.getenv('VIBEFY_EMOTION_BACKEND', 'keras')
+EMOTION_ONNX_MODEL = os.getenv('VIBEFY_EMOTION_ONNX_MODEL', os.path.join('models', 'emotion_model.onnx'))
+EMOTION_INT8 = os.getenv('VIBEFY_EMOTION_INT8', '0') == '1'
+
+# Content-addressed face result cache (0 entries = disabled)
+FACE_CACHE_ENTRIES = int(os.getenv('VIBEFY_FACE_CACHE_ENTRIES', '256'))
+FACE_CACHE_MB = float(os.getenv('VIBEFY_FACE_CACHE_MB', '32'))
+FACE_CACHE_DB = os.getenv('VIBEFY_FACE_CACHE_DB', '')
+
+# Multi-process inference pool shared across sessions (0 workers = run in-process)
+INFERENCE_WORKERS = int(os.getenv('VIBEFY_INFERENCE_WORKERS', '0'))
+TF_INTRA_THREADS = int(os.getenv('VIBEFY_TF_INTRA_THREADS', '1'))
+TF_INTER_THREADS = int(os.getenv('VIBEFY_TF_INTER_THREADS', '1'))
+# Give each pool worker its own slice of CPUs (intra-threads wide)
+PIN_WORKERS = os.getenv('VIBEFY_PIN_WORKERS', '0') == '1'
+
+# Threading policy for the serving process itself (empty = library defaults)
+INTRA_THREADS = int(os.getenv('VIBEFY_INTRA_THREADS', '0')) or None
+INTER_THREADS = int(os.getenv('VIBEFY_INTER_THREADS', '0')) or None
+CV_THREADS = int(os.getenv('VIBEFY_CV_THREADS', '-1'))
+CPU_AFFINITY = os.getenv('VIBEFY_CPU_AFFINITY', '')
+
+# Two-resolution detection: faces are located on a copy whose longest side is
+# at most DETECT_MAX_SIDE px, then cropped from the full-resolution frame.
+# Faces smaller than MIN_FACE_SIZE (original px) are ignored.
+DETECT_MAX_SIDE = int(os.getenv('VIBEFY_DETECT_MAX_SIDE', '480'))
+MIN_FACE_SIZE = int(os.getenv('VIBEFY_MIN_FACE_SIZE', '40'))
+
+# Mean absolute thumbnail difference below which FrameGate reuses the last result
+FRAME_GATE_THRESHOLD = float(os.getenv('VIBEFY_FRAME_GATE_THRESHOLD', '0.02'))
+
+# HuggingFace text emotion endpoint. The URL can point at a local stand-in
+# server for benchmarking. Connect and read timeouts are separate so an
+# unreachable host fails fast while a slow (cold) model still gets time to answer.
+HF_MODEL_ID = 'j-hartmann/emotion-english-distilroberta-base'
+HF_API_URL = os.getenv('VIBEFY_HF_API_URL', f'https://api-inference.huggingface.co/models/{HF_MODEL_ID}')
+HF_CONNECT_TIMEOUT = float(os.getenv('VIBEFY_HF_CONNECT_TIMEOUT', '3.05'))
+HF_READ_TIMEOUT = float(os.getenv('VIBEFY_HF_READ_TIMEOUT', '10'))
+# Keep-alive connections kept open per host (roughly the number of concurrent text requests)
+HF_POOL_MAXSIZE = int(os.getenv('VIBEFY_HF_POOL_MAXSIZE', '10'))
+
+# Resilience for the HuggingFace endpoint: each analysis gets HF_LATENCY_BUDGET
+# seconds in total, including up to HF_MAX_RETRIES jittered retries and waiting
+# for a cold model to load. After HF_BREAKER_FAILURES consecutive failures the
+# circuit opens and calls fail fast for HF_BREAKER_COOLDOWN seconds.
+HF_LATENCY_BUDGET = float(os.getenv('VIBEFY_HF_LATENCY_BUDGET', '8'))
+HF_MAX_RETRIES = int(os.getenv('VIBEFY_HF_MAX_RETRIES', '2'))
+HF_BACKOFF_SECONDS = float(os.getenv('VIBEFY_HF_BACKOFF_SECONDS', '0.25'))
+HF_BREAKER_FAILURES = int(os.getenv('VIBEFY_HF_BREAKER_FAILURES', '5'))
+HF_BREAKER_COOLDOWN = float(os.getenv('VIBEFY_HF_BREAKER_COOLDOWN', '30'))
+# Ping the endpoint in the background at start-up so the model is loaded before the first user
+HF_WARMUP = os.getenv('VIBEFY_HF_WARMUP', '1') == '1'
+
+# Text emotion backend: "api" (HuggingFace inference API) or "local" (the same
+# model loaded from TEXT_MODEL_PATH and run on CPU with PyTorch)
+TEXT_BACKENDS = ('api', 'local')
+DEFAULT_TEXT_BACKEND = os.getenv('VIBEFY_TEXT_BACKEND', 'api')
+TEXT_MODEL_PATH = os.getenv('VIBEFY_TEXT_MODEL_PATH', os.path.join('models', 'emotion-english-distilroberta-base'))
+TEXT_INT8 = os.getenv('VIBEFY_TEXT_INT8', '0') == '1'
+TEXT_MAX_TOKENS = int(os.getenv('VIBEFY_TEXT_MAX_TOKENS', '512'))
+# Dynamic batching: concurrent local requests are grouped into one forward pass
+# of up to TEXT_BATCH_SIZE texts, waiting at most TEXT_BATCH_WAIT_MS for company
+TEXT_BATCH_SIZE = int(os.getenv('VIBEFY_TEXT_BATCH_SIZE', '16'))
+TEXT_BATCH_WAIT_MS = float(os.getenv('VIBEFY_TEXT_BATCH_WAIT_MS', '5'))
+
+# Local lexicon fast path: texts of at most LEXICON_MAX_WORDS words are scored
+# in-process first. The lexicon answers only when at least LEXICON_MIN_COVERAGE
+# of the words carry emotion (mood words, negations, intensifiers), there is no
+# contrast ("but", "though", ...) and its top mood leads the runner-up by
+# LEXICON_MARGIN; everything else goes to the transformer.
+TEXT_LEXICON = os.getenv('VIBEFY_TEXT_LEXICON', '1') == '1'
+LEXICON_MARGIN = float(os.getenv('VIBEFY_LEXICON_MARGIN', '0.4'))
+LEXICON_MAX_WORDS = int(os.getenv('VIBEFY_LEXICON_MAX_WORDS', '8'))
+LEXICON_MIN_COVERAGE = float(os.getenv('VIBEFY_LEXICON_MIN_COVERAGE', '0.25'))
+
+# Texts longer than TEXT_CHUNK_TOKENS (estimated) are split on sentence
+# boundaries into chunks of at most that size, scored together and combined
+TEXT_CHUNK_TOKENS = int(os.getenv('VIBEFY_TEXT_CHUNK_TOKENS', '128'))
+
+# Text result cache: in-process LRU in front of a SQLite file (empty path =
+# memory only, 0 entries = disabled). Keys are whitespace/case-normalised text
+# plus the model, entries expire after TEXT_CACHE_TTL seconds (0 = never).
+TEXT_CACHE_ENTRIES = int(os.getenv('VIBEFY_TEXT_CACHE_ENTRIES', '1024'))
+TEXT_CACHE_MB = float(os.getenv('VIBEFY_TEXT_CACHE_MB', '4'))
+TEXT_CACHE_DB = os.getenv('VIBEFY_TEXT_CACHE_DB', 'vibefy_text_cache.db')
+TEXT_CACHE_DISK_ENTRIES = int(os.getenv('VIBEFY_TEXT_CACHE_DISK_ENTRIES', '100000'))
+TEXT_CACHE_TTL = float(os.getenv('VIBEFY_TEXT_CACHE_TTL', str(7 * 24 * 3600)))
+
 def normalize_emotion(emotion):
     """Normalize emotion labels to match our app's emotion set"""
     if emotion is None:
@@ -52,10 +196,223 @@ def normalize_emotion(emotion):
     logger.debug(f"Normalized emotion: {emotion} -> {normalized}")
     return normalized
 
-def detect_from_face(image_path):
+# Process-wide model registry: each detector configuration is loaded once and
+# shared by every Streamlit session/thread in this process.
+_model_registry = {}
+_model_registry_lock = threading.Lock()
+
+
+def _current_rss_bytes():
+    """Best-effort resident set size of this process in bytes (None if unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # ru_maxrss is the peak RSS (KiB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except Exception:
+        return None
+
+
+_thread_policy = {}
+_thread_policy_applied = False
+
+def parse_cpu_list(spec):
+    """Parse a CPU list such as "0-3,8" into [0, 1, 2, 3, 8]"""
+    cpus = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            first, last = part.split('-')
+            cpus.extend(range(int(first), int(last) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+def _set_process_affinity(cpus):
+    """
+    Restrict every thread of this process to `cpus`. On Linux
+    sched_setaffinity(0, ...) only changes the calling thread (new threads
+    inherit their creator's mask), so each thread in /proc/self/task is set.
+    Returns False where affinity isn't supported.
+    """
+    if not hasattr(os, 'sched_setaffinity'):
+        return False
+    try:
+        thread_ids = [int(tid) for tid in os.listdir('/proc/self/task')]
+    except OSError:
+        thread_ids = [0]
+    for tid in thread_ids:
+        try:
+            os.sched_setaffinity(tid, cpus)
+        except (ProcessLookupError, PermissionError):
+            pass  # the thread exited in the meantime
+    return True
+
+def _limit_loaded_thread_pools(intra_threads):
+    """
+    Resize OpenMP/BLAS pools that are already loaded (numpy's BLAS always is by
+    now), which the *_NUM_THREADS variables no longer reach. Needs the optional
+    threadpoolctl package; returns whether the limit was applied.
+    """
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        logger.warning("threadpoolctl not installed: OMP/MKL/OpenBLAS thread counts only apply to "
+                       "libraries loaded from now on, not numpy's BLAS")
+        return False
+    threadpool_limits(limits=intra_threads)
+    return True
+
+def configure_threading(intra_threads=None, inter_threads=None, cv_threads=None, cpus=None):
+    """
+    Apply a threading policy to this process: TensorFlow intra/inter-op pools,
+    OpenMP/BLAS pools, OpenCV's thread count and, optionally, CPU affinity.
+    None leaves a setting at the library default. What is enforced:
+    - CPU affinity applies to every thread of the process that exists now and
+      to the threads they start later (Linux);
+    - BLAS/OpenMP pools already loaded are resized only with threadpoolctl
+      installed; the environment variables cover libraries loaded afterwards;
+    - TensorFlow only honours the intra/inter-op counts if they are set before
+      it runs its first op, so call this before loading any model.
+    Returns the policy that was applied.
+    """
+    global _thread_policy_applied
+    blas_limited = False
+    if intra_threads:
+        for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'TF_NUM_INTRAOP_THREADS'):
+            os.environ[var] = str(intra_threads)
+        blas_limited = _limit_loaded_thread_pools(intra_threads)
+    if inter_threads:
+        os.environ['TF_NUM_INTEROP_THREADS'] = str(inter_threads)
+
+    if 'tensorflow' in sys.modules and (intra_threads or inter_threads):
+        tf = sys.modules['tensorflow']
+        try:
+            if intra_threads:
+                tf.config.threading.set_intra_op_parallelism_threads(intra_threads)
+            if inter_threads:
+                tf.config.threading.set_inter_op_parallelism_threads(inter_threads)
+        except RuntimeError as e:
+            logger.warning(f"TensorFlow already initialised, thread counts unchanged: {str(e)}")
+
+    if cv_threads is not None and cv_threads >= 0:
+        cv2.setNumThreads(cv_threads)
+
+    if cpus and not _set_process_affinity(cpus):
+        logger.warning("CPU affinity is not supported on this platform")
+
+    _thread_policy.update({
+        "intra_threads": intra_threads,
+        "inter_threads": inter_threads,
+        "cv_threads": cv_threads,
+        "cpus": list(cpus) if cpus else None,
+        "loaded_pools_limited": blas_limited,
+    })
+    _thread_policy_applied = True
+    logger.info(f"Threading policy for process {os.getpid()}: {_thread_policy}")
+    return dict(_thread_policy)
+
+def get_threading_policy():
+    return dict(_thread_policy)
+
+def _ensure_threading_policy():
+    """Apply the VIBEFY_* threading policy once, before the first model loads"""
+    if _thread_policy_applied:
+        return
+    if INTRA_THREADS or INTER_THREADS or CV_THREADS >= 0 or CPU_AFFINITY:
+        configure_threading(
+            intra_threads=INTRA_THREADS,
+            inter_threads=INTER_THREADS,
+            cv_threads=CV_THREADS if CV_THREADS >= 0 else None,
+            cpus=parse_cpu_list(CPU_AFFINITY) if CPU_AFFINITY else None,
+        )
+
+def get_model(key, loader):
+    """
+    Return the registry entry for `key`, calling `loader()` the first time only.
+    The entry holds the model plus a lock that callers hold while running inference.
+    """
+    with _model_registry_lock:
+        entry = _model_registry.get(key)
+        if entry is None:
+            entry = {
+                "model": None,
+                "lock": threading.RLock(),
+                "load_seconds": None,
+                "rss_delta_bytes": None,
+                "loaded_at": None,
+                "hits": 0,
+                "misses": 0,
+            }
+            _model_registry[key] = entry
+
+    # Load outside the registry lock so different configurations can load in parallel
+    with entry["lock"]:
+        if entry["model"] is None:
+            _ensure_threading_policy()
+            entry["misses"] += 1
+            logger.info(f"Loading model {key} into registry")
+            rss_before = _current_rss_bytes()
+            start = time.perf_counter()
+            entry["model"] = loader()
+            entry["load_seconds"] = time.perf_counter() - start
+            rss_after = _current_rss_bytes()
+            if rss_before is not None and rss_after is not None:
+                entry["rss_delta_bytes"] = rss_after - rss_before
+            entry["loaded_at"] = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+            logger.info(f"Model {key} loaded in {entry['load_seconds']:.2f}s")
+        else:
+            entry["hits"] += 1
+    return entry
+
+
+def _load_fer_detector(mtcnn):
+    # fer pulls in TensorFlow, so only import it when a FER detector is really needed
+    from fer import FER
+    return FER(mtcnn=mtcnn)
+
+def get_fer_detector(mtcnn=True):
+    """Return the shared registry entry for a FER detector with the given configuration"""
+    return get_model(("fer", bool(mtcnn)), lambda: _load_fer_detector(mtcnn))
+
+
+def get_model_registry_stats():
+    """Load time, memory and hit counts for every model loaded in this process"""
+    with _model_registry_lock:
+        items = list(_model_registry.items())
+    return {
+        str(key): {
+            "loaded": entry["model"] is not None,
+            "load_seconds": entry["load_seconds"],
+            "rss_delta_bytes": entry["rss_delta_bytes"],
+            "loaded_at": entry["loaded_at"],
+            "hits": entry["hits"],
+            "misses": entry["misses"],
+        }
+        for key, entry in items
+    }
+
+
+def clear_model_registry():
+    """Drop every cached model (mainly for tests and memory pressure)"""
+    with _model_registry_lock:
+        _model_registry.clear()
+    logger.info("Model registry cleared")
+
+
+def detect_from_face(image_path, detector=None, emotion_backend=None):
     """
     Takes an image path, detects face, predicts emotion using FER.
-    Returns: {"mood": "joy", "confidence": 0.85}
+    `detector` picks the face detector backend (see FACE_DETECTOR_BACKENDS) and
+    `emotion_backend` the classifier backend (see EMOTION_BACKENDS).
+    Returns: {"mood": "joy", "confidence": 0.85, "probabilities": ndarray}
     """
     try:
         logger.info(f"Starting face detection for image: {image_path}")
@@ -66,110 +423,1844 @@ def detect_from_face(image_path):
             logger.error(f"Could not read image from {image_path}")
             return {"mood": "neutral", "confidence": 0.0}
 
-        # Verify image dimensions and content
-        if img.size == 0 or len(img.shape) != 3:
-            logger.error(f"Invalid image format or dimensions: {img.shape if img is not None else 'None'}")
+        return detect_from_frame(img, detector=detector, emotion_backend=emotion_backend)
+    
+    except Exception as e:
+        logger.exception(f"Error in detect_from_face: {str(e)}")
+        return {"mood": "neutral", "confidence": 0.0}
+
+def detect_from_bytes(buf, detector=None, emotion_backend=None):
+    """
+    Takes encoded image bytes (JPEG/PNG, e.g. an upload), decodes them in memory
+    and predicts emotion. Returns: {"mood": "joy", "confidence": 0.85}
+    """
+    try:
+        if not buf:
+            logger.error("Empty image buffer")
+            return {"mood": "neutral", "confidence": 0.0}
+
+        data = np.frombuffer(buf, dtype=np.uint8)
+        img = cv2.imdecode(data, cv2.IMREAD_COLOR)
+        if img is None:
+            logger.error(f"Could not decode image buffer ({len(buf)} bytes)")
             return {"mood": "neutral", "confidence": 0.0}
 
-        # Log image properties
-        logger.debug(f"Image shape: {img.shape}, dtype: {img.dtype}")
+        return detect_from_frame(img, detector=detector, emotion_backend=emotion_backend)
 
-        # Convert to RGB for FER
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    except Exception as e:
+        logger.exception(f"Error in detect_from_bytes: {str(e)}")
+        return {"mood": "neutral", "confidence": 0.0}
 
-        # Initialize detector with MTCNN
-        logger.debug("Initializing FER detector with MTCNN")
-        detector = FER(mtcnn=True)
-        
-        # Detect faces and emotions
-        logger.debug("Starting face detection")
-        faces = detector.detect_emotions(img)
-        logger.info(f"Detected {len(faces)} face(s)")
+def detect_from_frame(frame, color="bgr", detector=None, emotion_backend=None):
+    """
+    Takes a frame as a NumPy array (BGR as returned by OpenCV, or RGB with
+    color="rgb"), detects face, predicts emotion using FER.
+    Returns: {"mood": "joy", "confidence": 0.85, "probabilities": ndarray}
+    ("probabilities" is ordered as MOOD_LABELS and missing when no face is found)
+    """
+    return detect_batch([frame], color=color, detector=detector, emotion_backend=emotion_backend)[0]
 
-        if not faces:
-            logger.warning("No faces detected in the image")
-            return {"mood": "neutral", "confidence": 0.0}
+def detect_batch(frames, color="bgr", tracker=None, detector=None, gate=None, emotion_backend=None,
+                 use_cache=True):
+    """
+    Takes a list of frames (NumPy arrays), locates the largest face in each and
+    classifies all face crops in a single batched forward pass.
+    Pass a FaceTracker to follow the face across consecutive frames instead of
+    running full face detection on every one; `detector` picks the face
+    detector backend (defaults to VIBEFY_FACE_DETECTOR). Pass a FrameGate to
+    reuse the previous result for frames that barely changed; `emotion_backend`
+    picks the classifier backend (defaults to VIBEFY_EMOTION_BACKEND).
+    Untracked frames are looked up in the shared ResultCache by pixel content
+    unless use_cache=False.
+    Returns one {"mood": ..., "confidence": ...} dict per frame, in input order.
+    """
+    results = [{"mood": "neutral", "confidence": 0.0} for _ in frames]
+    try:
+        logger.info(f"Starting batched face detection for {len(frames)} frame(s)")
+        classifier = get_emotion_classifier(emotion_backend)
+        target_size = _classifier_target_size(classifier["model"])
 
-        # Get emotions for the largest face
-        largest_face = max(faces, key=lambda x: x['box'][2] * x['box'][3])
-        emotions = largest_face['emotions']
-        logger.debug(f"Detected emotions: {emotions}")
-        
-        # Find the dominant emotion
-        dominant_emotion = max(emotions.items(), key=lambda x: x[1])
-        emotion_label, confidence = dominant_emotion
+        # Tracked results depend on tracker state, so only cache untracked frames
+        cache = get_face_cache() if use_cache and tracker is None else None
+        cache_keys = {}  # frame index -> cache key, for frames that ran inference
 
-        # Validate confidence
-        if confidence < 0.1:  # Minimum confidence threshold
-            logger.warning(f"Low confidence ({confidence}) for emotion: {emotion_label}")
-            return {"mood": "neutral", "confidence": 0.0}
+        crops = []
+        owners = []
+        reused = []  # (frame index, index of the processed frame whose result it reuses)
+        last_processed = None
+        for i, frame in enumerate(frames):
+            try:
+                if cache is not None and frame is not None:
+                    cache_key = _face_cache_key(frame, color, detector, emotion_backend)
+                    cached = cache.get(cache_key)
+                    if cached is not None:
+                        logger.debug(f"Frame {i}: result cache hit")
+                        results[i] = cached
+                        continue
+                    cache_keys[i] = cache_key
+
+                rgb = _to_rgb(frame, color)
+                if rgb is None:
+                    continue
+
+                gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+                if gate is not None and gate.should_skip(gray):
+                    reused.append((i, last_processed))
+                    cache_keys.pop(i, None)  # a near-duplicate's result isn't this frame's own
+                    continue
+                last_processed = i
+
+                if tracker is not None:
+                    largest_face = tracker.locate(rgb, gray)
+                    if largest_face is None:
+                        logger.warning(f"No faces detected in frame {i}")
+                        continue
+                else:
+                    boxes = locate_faces(rgb, detector=detector)
+                    logger.debug(f"Frame {i}: detected {len(boxes)} face(s)")
+                    if not boxes:
+                        logger.warning(f"No faces detected in frame {i}")
+                        continue
+
+                    # Classify only the largest face of each frame
+                    largest_face = max(boxes, key=lambda b: b[2] * b[3])
+                face = _crop_face(gray, largest_face, target_size)
+                if face is None:
+                    continue
+                crops.append(face)
+                owners.append(i)
+            except Exception as e:
+                cache_keys.pop(i, None)
+                logger.exception(f"Error preparing frame {i}: {str(e)}")
+
+        if crops:
+            probabilities = _classify_faces(np.stack(crops), classifier)
+            for i, probs in zip(owners, probabilities):
+                results[i] = _result_from_probabilities(probs)
+        else:
+            logger.warning("No usable faces in batch")
+
+        if gate is not None:
+            for i, ref in reused:
+                previous = results[ref] if ref is not None else gate.last_result
+                if previous is not None:
+                    results[i] = dict(previous)
+            if last_processed is not None:
+                gate.last_result = results[last_processed]
+
+        if cache is not None:
+            for i, cache_key in cache_keys.items():
+                cache.put(cache_key, results[i])
+
+        logger.info(f"Batch results: {results}")
+        return results
+
+    except Exception as e:
+        logger.exception(f"Error in detect_batch: {str(e)}")
+        return results
+
+def _json_default(value):
+    if isinstance(value, np.ndarray):
+        return {"__ndarray__": value.tolist(), "dtype": str(value.dtype)}
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot serialise {type(value)}")
+
+def _json_object_hook(value):
+    if "__ndarray__" in value:
+        return np.asarray(value["__ndarray__"], dtype=value.get("dtype", "float32"))
+    return value
+
+def _copy_result(value):
+    """Shallow copy of a cached result with its arrays copied, so callers can't mutate the cache"""
+    if isinstance(value, dict):
+        return {k: v.copy() if isinstance(v, np.ndarray) else v for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy_result(v) for v in value]
+    return value
+
+class ResultCache:
+    """
+    Thread-safe LRU cache of detection results keyed by strings, bounded by
+    entry count and by the size of the JSON-encoded values. With `db_path`
+    every entry is also written to a SQLite file, so results survive restarts;
+    `max_disk_entries` bounds that file: once it is exceeded the oldest rows
+    are deleted down to 90% of the bound. With `ttl` (seconds) entries older
+    than that are treated as misses and dropped. Values go in and come out as
+    copies, so callers may modify what they get. SQLite is only touched under
+    its own lock, never while the memory tier is locked.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=32 * 1024 * 1024, db_path=None, ttl=None,
+                 max_disk_entries=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self.expired = 0
+        self._entries = OrderedDict()  # key -> (value, size in bytes, created)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._disk_rows = 0  # upper bound on the rows in the file, recounted before evicting
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT, created REAL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_created ON results (created)")
+            self._db.commit()
+            self._disk_rows = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def _is_expired(self, created):
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def get(self, key):
+        """Cached value for `key`, or None on a miss"""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and not self._is_expired(item[2]):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return _copy_result(item[0])
+            expired = item is not None
+            if expired:
+                self._forget(key)
+
+        row = None
+        if self._db is not None:
+            with self._db_lock:
+                if not expired:
+                    row = self._db.execute("SELECT value, created FROM results WHERE key = ?", (key,)).fetchone()
+                    expired = row is not None and self._is_expired(row[1])
+                if expired:
+                    cursor = self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+                    self._disk_rows -= max(cursor.rowcount, 0)
+                    self._db.commit()
+        value = json.loads(row[0], object_hook=_json_object_hook) if row is not None and not expired else None
+
+        with self._lock:
+            if expired:
+                self.expired += 1
+            if value is not None:
+                self._remember(key, value, len(row[0]), row[1])
+                self.hits += 1
+                self.disk_hits += 1
+                return _copy_result(value)
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        encoded = json.dumps(value, default=_json_default)
+        created = time.time()
+        with self._lock:
+            self._remember(key, _copy_result(value), len(encoded), created)
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("INSERT OR REPLACE INTO results (key, value, created) VALUES (?, ?, ?)",
+                                 (key, encoded, created))
+                self._disk_rows += 1
+                if self.max_disk_entries and self._disk_rows > self.max_disk_entries:
+                    self._evict_disk()
+                self._db.commit()
+
+    def _evict_disk(self):
+        """Delete the oldest rows down to 90% of max_disk_entries; caller holds _db_lock"""
+        # Replacing an existing key also counted as a new row, so count before deleting
+        self._disk_rows = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        if self._disk_rows <= self.max_disk_entries:
+            return
+        excess = self._disk_rows - int(self.max_disk_entries * 0.9)
+        # Walks the created index from the oldest end, so the cost tracks `excess`
+        cursor = self._db.execute(
+            "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY created LIMIT ?)", (excess,))
+        deleted = max(cursor.rowcount, 0)
+        self._disk_rows -= deleted
+        self.disk_evictions += deleted
+
+    def _remember(self, key, value, size, created):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+        self._entries[key] = (value, size, created)
+        self._bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def _forget(self, key):
+        """Drop an expired entry from memory (get() removes it from disk)"""
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM results")
+                self._db.commit()
+                self._disk_rows = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "evictions": self.evictions,
+                "disk_entries": self._disk_rows,
+                "disk_evictions": self.disk_evictions,
+                "expired": self.expired,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+_face_cache = None
+_face_cache_lock = threading.Lock()
+
+def get_face_cache():
+    """
+    Process-wide face result cache sized by VIBEFY_FACE_CACHE_ENTRIES and
+    VIBEFY_FACE_CACHE_MB, persisted to VIBEFY_FACE_CACHE_DB if set;
+    None when VIBEFY_FACE_CACHE_ENTRIES=0.
+    """
+    global _face_cache
+    if FACE_CACHE_ENTRIES <= 0:
+        return None
+    with _face_cache_lock:
+        if _face_cache is None:
+            _face_cache = ResultCache(
+                max_entries=FACE_CACHE_ENTRIES,
+                max_bytes=int(FACE_CACHE_MB * 1024 * 1024),
+                db_path=FACE_CACHE_DB or None,
+            )
+    return _face_cache
+
+def frame_digest(frame):
+    """Fast content hash of a decoded image (pixels, shape and dtype)"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{frame.shape}{frame.dtype.str}".encode())
+    digest.update(np.ascontiguousarray(frame).data)
+    return digest.hexdigest()
+
+def _face_cache_key(frame, color, detector, emotion_backend):
+    """Cache key: pixel digest plus every setting that changes the result"""
+    config = (
+        color,
+        detector or DEFAULT_FACE_DETECTOR,
+        emotion_backend or DEFAULT_EMOTION_BACKEND,
+        EMOTION_INT8,
+        DETECT_MAX_SIDE,
+        MIN_FACE_SIZE,
+    )
+    return f"face:{frame_digest(frame)}:{':'.join(str(v) for v in config)}"
+
+def _to_rgb(frame, color="bgr"):
+    """Validate a frame and return it as an RGB uint8 array (None if unusable)"""
+    # Verify image dimensions and content
+    if frame is None or frame.size == 0 or len(frame.shape) != 3:
+        logger.error(f"Invalid image format or dimensions: {frame.shape if frame is not None else 'None'}")
+        return None
+
+    # Log image properties
+    logger.debug(f"Image shape: {frame.shape}, dtype: {frame.dtype}")
+
+    # Convert to RGB for FER
+    if color == "bgr":
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    return frame
+
+def get_face_detector(detector=None):
+    """Return the shared registry entry for a face detector backend"""
+    detector = detector or DEFAULT_FACE_DETECTOR
+    if detector == "mtcnn":
+        return get_fer_detector(mtcnn=True)
+    if detector == "haar":
+        return get_model(("face_detector", "haar"), _load_haar_face_detector)
+    if detector == "opencv_dnn":
+        return get_model(("face_detector", "opencv_dnn"), _load_dnn_face_detector)
+    raise ValueError(f"Unknown face detector backend: {detector} (expected one of {FACE_DETECTOR_BACKENDS})")
+
+def _load_haar_face_detector():
+    """Load the frontal-face Haar cascade FER uses, straight from OpenCV (no TensorFlow)"""
+    return cv2.CascadeClassifier(os.path.join(cv2.data.haarcascades, 'haarcascade_frontalface_default.xml'))
+
+def _haar_find_faces(cascade, rgb, min_size):
+    """Run the Haar cascade with FER's default parameters"""
+    gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+    faces = cascade.detectMultiScale(
+        gray,
+        scaleFactor=1.1,
+        minNeighbors=5,
+        flags=cv2.CASCADE_SCALE_IMAGE,
+        minSize=(min_size, min_size),
+    )
+    return list(faces)
+
+def _load_dnn_face_detector():
+    """Load OpenCV's ResNet-10 SSD face detector from DNN_FACE_MODEL_DIR"""
+    prototxt = os.path.join(DNN_FACE_MODEL_DIR, 'deploy.prototxt')
+    weights = os.path.join(DNN_FACE_MODEL_DIR, 'res10_300x300_ssd_iter_140000.caffemodel')
+    if not os.path.exists(prototxt) or not os.path.exists(weights):
+        raise FileNotFoundError(f"OpenCV DNN face detector files not found in {DNN_FACE_MODEL_DIR}")
+    logger.debug(f"Loading OpenCV DNN face detector from {DNN_FACE_MODEL_DIR}")
+    return cv2.dnn.readNetFromCaffe(prototxt, weights)
+
+def _dnn_find_faces(net, rgb):
+    """Run the SSD face detector and return (x, y, w, h) boxes above DNN_FACE_CONFIDENCE"""
+    height, width = rgb.shape[:2]
+    bgr = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+    blob = cv2.dnn.blobFromImage(cv2.resize(bgr, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0))
+    net.setInput(blob)
+    detections = net.forward()
+
+    boxes = []
+    for detection in detections[0, 0]:
+        if float(detection[2]) < DNN_FACE_CONFIDENCE:
+            continue
+        x1, y1, x2, y2 = (detection[3:7] * np.array([width, height, width, height])).astype(int)
+        if x2 > x1 and y2 > y1:
+            boxes.append((x1, y1, x2 - x1, y2 - y1))
+    return boxes
+
+def _apply_min_face_size(model, min_size):
+    """
+    Point FER's MTCNN at the minimum face size for this call (caller holds the
+    lock). FER keeps the MTCNN instance in `_mtcnn`; a Haar-based FER has none.
+    """
+    mtcnn = getattr(model, "_mtcnn", None)
+    if mtcnn is not None and hasattr(mtcnn, "min_face_size"):
+        mtcnn.min_face_size = int(min_size)
+
+def locate_faces(rgb, detector=None, max_side=None, min_face_size=None):
+    """
+    Run a face detector backend on an RGB image, returning (x, y, w, h) boxes
+    in the coordinates of `rgb`. Detection runs on a copy downscaled so its
+    longest side is at most `max_side` (DETECT_MAX_SIDE by default); faces
+    smaller than `min_face_size` original pixels are neither searched for nor
+    returned, which keeps MTCNN from building its smallest pyramid levels.
+    The haar and opencv_dnn backends only need OpenCV, not TensorFlow.
+    """
+    detector = detector or DEFAULT_FACE_DETECTOR
+    max_side = DETECT_MAX_SIDE if max_side is None else max_side
+    min_face_size = MIN_FACE_SIZE if min_face_size is None else min_face_size
+
+    height, width = rgb.shape[:2]
+    scale = 1.0
+    small = rgb
+    if max_side and max(height, width) > max_side:
+        scale = max_side / float(max(height, width))
+        small_size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+        small = cv2.resize(rgb, small_size, interpolation=cv2.INTER_AREA)
+        logger.debug(f"Detecting faces on {small_size[0]}x{small_size[1]} copy (scale {scale:.2f})")
+
+    entry = get_face_detector(detector)
+    scaled_min_size = max(12, int(min_face_size * scale))
+    with entry["lock"]:
+        if detector == "opencv_dnn":
+            boxes = _dnn_find_faces(entry["model"], small)
+        elif detector == "haar":
+            boxes = _haar_find_faces(entry["model"], small, scaled_min_size)
+        else:
+            _apply_min_face_size(entry["model"], scaled_min_size)
+            boxes = entry["model"].find_faces(small, bgr=False)
+
+    # Map boxes back to the original resolution
+    mapped = [tuple(int(round(int(v) / scale)) for v in box) for box in boxes]
+    return [box for box in mapped if min(box[2], box[3]) >= min_face_size]
+
+def _clip_box(box, shape):
+    """Clip an (x, y, w, h) box to the bounds of an image with the given shape"""
+    height, width = shape[:2]
+    x, y, w, h = box
+    x1, y1 = max(0, x), max(0, y)
+    x2, y2 = min(width, x + w), min(height, y + h)
+    return x1, y1, max(0, x2 - x1), max(0, y2 - y1)
+
+class FaceTracker:
+    """
+    Detect-once, track-afterwards face localisation for a sequence of frames.
+    Full detection runs on the first frame, every `redetect_every` frames and
+    whenever the template-match score drops below `min_score`; in between the
+    previous box is followed with cv2.matchTemplate in a window around it.
+    Not thread-safe: use one tracker per frame stream.
+    """
+
+    def __init__(self, min_score=0.6, search_margin=0.5, redetect_every=10, detector=None):
+        self.min_score = min_score
+        self.search_margin = search_margin
+        self.redetect_every = redetect_every
+        self.detector = detector
+        self.detections = 0
+        self.tracked = 0
+        self.lost = 0
+        self.last_score = None
+        self.reset()
+
+    def reset(self):
+        """Forget the current face so the next frame runs full detection"""
+        self.box = None
+        self.template = None
+        self.frames_since_detect = 0
+
+    def locate(self, rgb, gray=None):
+        """Return the (x, y, w, h) box of the tracked face in this frame, or None"""
+        if gray is None:
+            gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+
+        if self.box is not None and self.frames_since_detect < self.redetect_every:
+            box, score = self._track(gray)
+            self.last_score = score
+            if box is not None and score >= self.min_score:
+                self.box = box
+                self.frames_since_detect += 1
+                self.tracked += 1
+                logger.debug(f"Tracked face to {box} (score {score:.2f})")
+                return box
+            self.lost += 1
+            logger.debug(f"Tracking confidence dropped ({score:.2f}), re-detecting")
+
+        return self._detect(rgb, gray)
+
+    def _detect(self, rgb, gray):
+        self.detections += 1
+        boxes = locate_faces(rgb, detector=self.detector)
+        if not boxes:
+            self.reset()
+            return None
+
+        box = _clip_box(max(boxes, key=lambda b: b[2] * b[3]), gray.shape)
+        x, y, w, h = box
+        if w == 0 or h == 0:
+            self.reset()
+            return None
+
+        self.box = box
+        self.template = gray[y:y + h, x:x + w].copy()
+        self.frames_since_detect = 0
+        return box
+
+    def _track(self, gray):
+        x, y, w, h = self.box
+        margin_x, margin_y = int(w * self.search_margin), int(h * self.search_margin)
+        x1, y1, win_w, win_h = _clip_box((x - margin_x, y - margin_y, w + 2 * margin_x, h + 2 * margin_y), gray.shape)
+        window = gray[y1:y1 + win_h, x1:x1 + win_w]
+
+        template_h, template_w = self.template.shape[:2]
+        if window.shape[0] < template_h or window.shape[1] < template_w:
+            return None, 0.0
+
+        scores = cv2.matchTemplate(window, self.template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, location = cv2.minMaxLoc(scores)
+        return (x1 + location[0], y1 + location[1], template_w, template_h), float(score)
+
+    def stats(self):
+        return {
+            "detections": self.detections,
+            "tracked": self.tracked,
+            "lost": self.lost,
+            "last_score": self.last_score,
+        }
+
+class FrameGate:
+    """
+    Cheap change detector placed in front of face inference. Each frame is
+    shrunk to a tiny grayscale thumbnail and compared with the thumbnail of the
+    last frame that actually ran inference; if the mean absolute difference is
+    below `threshold` (fraction of full scale) the previous result is reused.
+    After `max_reuse` consecutive skips the next frame is always processed.
+    """
+
+    def __init__(self, threshold=None, size=(32, 24), max_reuse=4):
+        self.threshold = threshold if threshold is not None else FRAME_GATE_THRESHOLD
+        self.size = size
+        self.max_reuse = max_reuse
+        self.last_result = None
+        self.checks = 0
+        self.skips = 0
+        self.consecutive_skips = 0
+        self.last_diff = None
+        self._signature = None
+
+    def should_skip(self, gray):
+        """True if this grayscale frame is close enough to the last processed one to reuse its result"""
+        signature = cv2.resize(gray, self.size, interpolation=cv2.INTER_AREA).astype(np.float32)
+        self.checks += 1
+        if self._signature is not None and self.consecutive_skips < self.max_reuse:
+            self.last_diff = float(np.mean(np.abs(signature - self._signature))) / 255.0
+            if self.last_diff < self.threshold:
+                self.skips += 1
+                self.consecutive_skips += 1
+                logger.debug(f"Frame gate hit (diff {self.last_diff:.4f})")
+                return True
+
+        self._signature = signature
+        self.consecutive_skips = 0
+        return False
+
+    def stats(self):
+        return {
+            "checks": self.checks,
+            "skips": self.skips,
+            "hit_rate": round(self.skips / self.checks, 3) if self.checks else 0.0,
+            "threshold": self.threshold,
+            "last_diff": self.last_diff,
+        }
+
+def _load_emotion_classifier():
+    """Load the emotion CNN that ships with the fer package"""
+    import fer
+    from tensorflow.keras.models import load_model
+    model_path = os.path.join(os.path.dirname(fer.__file__), 'data', 'emotion_model.hdf5')
+    logger.debug(f"Loading emotion classifier from {model_path}")
+    return load_model(model_path, compile=False)
+
+class OnnxEmotionClassifier:
+    """
+    FER's emotion CNN exported to ONNX (see modules/export_emotion_model.py),
+    run with ONNX Runtime or OpenCV's DNN module. Never imports TensorFlow.
+    Takes and returns the same NHWC batches as the Keras model.
+    """
+
+    def __init__(self, model_path, runtime="onnxruntime"):
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"ONNX emotion model not found: {model_path}")
+        self.runtime = runtime
+        if runtime == "onnxruntime":
+            import onnxruntime as ort
+            options = ort.SessionOptions()
+            if _thread_policy.get("intra_threads"):
+                options.intra_op_num_threads = _thread_policy["intra_threads"]
+            if _thread_policy.get("inter_threads"):
+                options.inter_op_num_threads = _thread_policy["inter_threads"]
+            self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+            model_input = self.session.get_inputs()[0]
+            self.input_name = model_input.name
+            _, _, height, width = model_input.shape
+            if not isinstance(height, int) or not isinstance(width, int):
+                height, width = 64, 64
+        else:
+            self.net = cv2.dnn.readNetFromONNX(model_path)
+            height, width = 64, 64  # cv2.dnn doesn't expose input shapes; FER's model is 64x64
+        # Mirror Keras' NHWC input_shape so callers don't care which runtime is used
+        self.input_shape = (None, height, width, 1)
+
+    def __call__(self, faces, training=False):
+        # The model is exported with an NCHW input
+        batch = np.ascontiguousarray(faces.transpose(0, 3, 1, 2), dtype=np.float32)
+        if self.runtime == "onnxruntime":
+            return self.session.run(None, {self.input_name: batch})[0]
+        self.net.setInput(batch)
+        return self.net.forward()
+
+def _emotion_onnx_path(quantized=None):
+    quantized = EMOTION_INT8 if quantized is None else quantized
+    if quantized:
+        root, ext = os.path.splitext(EMOTION_ONNX_MODEL)
+        return f"{root}.int8{ext}"
+    return EMOTION_ONNX_MODEL
+
+def get_emotion_classifier(backend=None, quantized=None):
+    """
+    Return the shared registry entry for the emotion classifier.
+    backend: "keras" (FER's model via TensorFlow), "onnx" (ONNX Runtime) or
+    "opencv" (cv2.dnn); defaults to VIBEFY_EMOTION_BACKEND. `quantized` picks
+    the int8 ONNX export (defaults to VIBEFY_EMOTION_INT8).
+    """
+    backend = backend or DEFAULT_EMOTION_BACKEND
+    if backend == "keras":
+        return get_model(("emotion_classifier", "keras"), _load_emotion_classifier)
+    if backend in ("onnx", "opencv"):
+        model_path = _emotion_onnx_path(quantized)
+        runtime = "onnxruntime" if backend == "onnx" else "opencv"
+        return get_model(("emotion_classifier", backend, model_path),
+                         lambda: OnnxEmotionClassifier(model_path, runtime=runtime))
+    raise ValueError(f"Unknown emotion classifier backend: {backend} (expected one of {EMOTION_BACKENDS})")
+
+def _classifier_target_size(model):
+    """(width, height) expected by the classifier input layer"""
+    _, height, width, _ = model.input_shape
+    return (width, height)
+
+def _square_box(box):
+    """Grow the shorter side of a box so it becomes square (same as FER.tosquare)"""
+    x, y, w, h = box
+    if h > w:
+        diff = h - w
+        x -= diff // 2
+        w += diff
+    elif w > h:
+        diff = w - h
+        y -= diff // 2
+        h += diff
+    return x, y, w, h
+
+def _crop_face(gray, box, target_size):
+    """
+    Cut a face out of a grayscale image the way FER does (square box, offsets,
+    zero padding) and return it preprocessed for the classifier
+    """
+    x, y, w, h = _square_box(box)
+    x_off, y_off = FACE_OFFSETS
+    padded = cv2.copyMakeBorder(gray, FACE_PADDING, FACE_PADDING, FACE_PADDING, FACE_PADDING,
+                                cv2.BORDER_CONSTANT, value=0)
+    x1 = max(0, x - x_off + FACE_PADDING)
+    y1 = max(0, y - y_off + FACE_PADDING)
+    x2 = x + w + x_off + FACE_PADDING
+    y2 = y + h + y_off + FACE_PADDING
+    face = padded[y1:y2, x1:x2]
+    if face.size == 0:
+        logger.warning(f"Empty face crop for box {box}")
+        return None
+
+    face = cv2.resize(face, target_size).astype(np.float32) / 255.0
+    face = (face - 0.5) * 2.0
+    return face[..., np.newaxis]
+
+def _classify_faces(faces, classifier=None):
+    """Run the emotion classifier on a stack of preprocessed face crops"""
+    entry = classifier or get_emotion_classifier()
+    logger.debug(f"Classifying batch of {len(faces)} face(s)")
+    with entry["lock"]:
+        return np.asarray(entry["model"](faces, training=False))
+
+def _result_from_probabilities(probs, labels=FER_EMOTION_LABELS):
+    """
+    Turn a classifier probability vector into the {"mood", "confidence"} contract.
+    The full distribution is kept under "probabilities", ordered as MOOD_LABELS.
+    """
+    probabilities = np.asarray(probs, dtype=np.float32)
+    idx = int(np.argmax(probabilities))
+    emotion_label = labels[idx]
+    confidence = float(probabilities[idx])
+
+    # Validate confidence
+    if confidence < 0.1:  # Minimum confidence threshold
+        logger.warning(f"Low confidence ({confidence}) for emotion: {emotion_label}")
+        return {"mood": "neutral", "confidence": 0.0, "probabilities": probabilities}
+
+    logger.info(f"Dominant emotion: {emotion_label} with confidence: {confidence:.2f}")
+
+    # Normalize emotion label
+    return {"mood": normalize_emotion(emotion_label), "confidence": confidence, "probabilities": probabilities}
+
+class MoodAggregator:
+    """
+    Streaming aggregate of per-frame probability vectors (ordered as MOOD_LABELS).
+    Keeps an exponentially weighted running distribution and reports when the
+    leading emotion is ahead of the runner-up by at least `margin`, so a
+    recording can stop early.
+    """
+
+    def __init__(self, alpha=0.5, margin=0.25, min_samples=2):
+        self.alpha = alpha
+        self.margin = margin
+        self.min_samples = min_samples
+        self.samples = 0
+        self.distribution = None
 
-        logger.info(f"Dominant emotion: {emotion_label} with confidence: {confidence:.2f}")
+    def update(self, result):
+        """Fold in a detection result (or a raw probability vector); returns False if it had none"""
+        probs = result.get("probabilities") if isinstance(result, dict) else result
+        if probs is None:
+            return False
 
-        # Normalize emotion label
-        normalized_emotion = normalize_emotion(emotion_label)
+        probs = np.asarray(probs, dtype=np.float32)
+        total = float(probs.sum())
+        if total <= 0:
+            return False
+        probs = probs / total
+
+        if self.distribution is None:
+            self.distribution = probs
+        else:
+            self.distribution = self.alpha * probs + (1 - self.alpha) * self.distribution
+        self.samples += 1
+        return True
+
+    def leading_margin(self):
+        """Gap between the top two emotions in the running distribution"""
+        if self.distribution is None:
+            return 0.0
+        top_two = np.sort(self.distribution)[-2:]
+        return float(top_two[1] - top_two[0])
+
+    def is_confident(self):
+        return self.samples >= self.min_samples and self.leading_margin() >= self.margin
+
+    def result(self):
+        """Current estimate as {"mood", "confidence", "probabilities"}, or None before any sample"""
+        if self.distribution is None:
+            return None
+        idx = int(np.argmax(self.distribution))
+        return {
+            "mood": MOOD_LABELS[idx],
+            "confidence": float(self.distribution[idx]),
+            "probabilities": self.distribution.copy(),
+        }
+
+def _worker_cpus(worker_counter, width):
+    """Next `width`-wide slice of the CPUs this process may run on, one slice per worker"""
+    available = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count() or 1))
+    with worker_counter.get_lock():
+        index = worker_counter.value
+        worker_counter.value += 1
+    start = (index * width) % len(available)
+    return [available[(start + i) % len(available)] for i in range(min(width, len(available)))]
+
+def _pool_worker_init(intra_threads, inter_threads, detector, emotion_backend, worker_counter=None):
+    """Runs once in every pool process: apply the threading policy, then warm the models"""
+    cpus = _worker_cpus(worker_counter, intra_threads) if worker_counter is not None else None
+    if (emotion_backend or DEFAULT_EMOTION_BACKEND) == "keras" or (detector or DEFAULT_FACE_DETECTOR) == "mtcnn":
+        import tensorflow  # imported first so configure_threading can set its pools before any op
+    configure_threading(intra_threads, inter_threads, cv_threads=intra_threads, cpus=cpus)
+
+    get_face_detector(detector)
+    get_emotion_classifier(emotion_backend)
+    logger.info(f"Inference pool worker {os.getpid()} ready")
+
+def _pool_detect(frames, color, tracker, gate, detector, emotion_backend):
+    """Pool job: detect_batch in a worker process, returning the updated tracker/gate state too"""
+    results = detect_batch(frames, color=color, tracker=tracker, detector=detector,
+                           gate=gate, emotion_backend=emotion_backend)
+    return results, tracker, gate
+
+def _pool_detect_bytes(buf, detector, emotion_backend):
+    """Pool job: decode and score one encoded image, returning (result, seconds)"""
+    start = time.perf_counter()
+    result = detect_from_bytes(buf, detector=detector, emotion_backend=emotion_backend)
+    return result, time.perf_counter() - start
+
+class InferencePool:
+    """
+    Process pool for face inference shared by every Streamlit session in this
+    server. Each of the `workers` processes loads its models once at start-up
+    and limits TensorFlow/OpenCV to the given thread counts, so concurrent
+    sessions run on separate cores instead of queueing on one interpreter.
+    """
+
+    def __init__(self, workers=None, intra_threads=1, inter_threads=1, detector=None, emotion_backend=None,
+                 pin_cpus=False):
+        self.workers = workers or max(1, (os.cpu_count() or 2) // 2)
+        self.detector = detector
+        self.emotion_backend = emotion_backend
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        # spawn: TensorFlow is not fork-safe
+        context = multiprocessing.get_context("spawn")
+        worker_counter = context.Value('i', 0) if pin_cpus else None
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_pool_worker_init,
+            initargs=(intra_threads, inter_threads, detector, emotion_backend, worker_counter),
+        )
+        logger.info(f"Inference pool started with {self.workers} worker(s), "
+                    f"{intra_threads} intra-op / {inter_threads} inter-op thread(s) each"
+                    f"{', pinned to CPUs' if pin_cpus else ''}")
+
+    def submit(self, frames, color="bgr", tracker=None, gate=None):
+        """Queue a detect_batch job; the future resolves to (results, tracker, gate)"""
+        return self._submit(_pool_detect, list(frames), color, tracker, gate,
+                            self.detector, self.emotion_backend)
+
+    def submit_bytes(self, buf):
+        """Queue scoring of one encoded image; the future resolves to (result, seconds)"""
+        return self._submit(_pool_detect_bytes, buf, self.detector, self.emotion_backend)
+
+    def _submit(self, fn, *args):
+        future = self._executor.submit(fn, *args)
+        with self._lock:
+            self.submitted += 1
+        future.add_done_callback(self._job_done)
+        return future
+
+    def _job_done(self, future):
+        with self._lock:
+            if future.exception() is None:
+                self.completed += 1
+            else:
+                self.failed += 1
+
+    def detect_batch(self, frames, color="bgr", tracker=None, gate=None, timeout=None):
+        """
+        Drop-in replacement for detect_batch that runs in the pool. Tracker and
+        gate state travels with the job and is copied back afterwards.
+        Falls back to in-process inference if the pool fails.
+        """
+        try:
+            results, new_tracker, new_gate = self.submit(frames, color, tracker, gate).result(timeout)
+            if tracker is not None:
+                tracker.__dict__.update(new_tracker.__dict__)
+            if gate is not None:
+                gate.__dict__.update(new_gate.__dict__)
+            return results
+        except Exception as e:
+            logger.exception(f"Inference pool job failed, running in-process: {str(e)}")
+            return detect_batch(frames, color=color, tracker=tracker, detector=self.detector,
+                                gate=gate, emotion_backend=self.emotion_backend)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+        logger.info(f"Inference pool stopped: {self.stats()}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "in_flight": self.submitted - self.completed - self.failed,
+            }
+
+_inference_pool = None
+_inference_pool_lock = threading.Lock()
+
+def get_inference_pool():
+    """
+    Process-wide InferencePool configured from VIBEFY_INFERENCE_WORKERS,
+    VIBEFY_TF_INTRA_THREADS, VIBEFY_TF_INTER_THREADS and VIBEFY_PIN_WORKERS; None when the pool
+    is disabled (VIBEFY_INFERENCE_WORKERS=0, the default).
+    """
+    global _inference_pool
+    if INFERENCE_WORKERS <= 0:
+        return None
+    with _inference_pool_lock:
+        if _inference_pool is None:
+            _inference_pool = InferencePool(
+                workers=INFERENCE_WORKERS,
+                intra_threads=TF_INTRA_THREADS,
+                inter_threads=TF_INTER_THREADS,
+                pin_cpus=PIN_WORKERS,
+            )
+            atexit.register(_inference_pool.shutdown, False)
+    return _inference_pool
+
+class LocalTextClassifier:
+    """
+    The HuggingFace text emotion model loaded from a local directory and run on
+    CPU with PyTorch, optionally with int8 dynamic quantization of its Linear
+    layers. Called with a list of texts it returns an (n, 7) float32 array of
+    probabilities ordered as MOOD_LABELS.
+    """
+
+    def __init__(self, model_path, quantized=False, max_tokens=TEXT_MAX_TOKENS):
+        # torch/transformers are optional and only needed for the local backend
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        if not os.path.isdir(model_path):
+            raise FileNotFoundError(
+                f"Text model not found at {model_path}; download {HF_MODEL_ID} there "
+                f"or set VIBEFY_TEXT_MODEL_PATH"
+            )
+        intra_threads = _thread_policy.get("intra_threads")
+        if intra_threads:
+            torch.set_num_threads(intra_threads)
+
+        self._torch = torch
+        self.max_tokens = max_tokens
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=True)
+        model = AutoModelForSequenceClassification.from_pretrained(model_path, local_files_only=True)
+        model.eval()
+        if quantized:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model
+
+        # Column order that maps the model's labels onto MOOD_LABELS
+        labels = [normalize_emotion(model.config.id2label[i]) for i in range(model.config.num_labels)]
+        self._order = [labels.index(mood) for mood in MOOD_LABELS]
+
+    def __call__(self, texts):
+        inputs = self.tokenizer(list(texts), padding=True, truncation=True,
+                                max_length=self.max_tokens, return_tensors='pt')
+        with self._torch.inference_mode():
+            logits = self.model(**inputs).logits
+        probs = self._torch.softmax(logits, dim=-1).numpy().astype(np.float32)
+        return probs[:, self._order]
+
+class TextBatcher:
+    """
+    Dynamic batching in front of a text classifier. Texts submitted from any
+    thread (e.g. several Streamlit sessions) are queued; a single worker
+    thread takes the first waiting text, collects more for up to `max_wait`
+    seconds or until `max_batch` texts, and classifies them in one pass.
+    submit() returns a Future resolving to that text's probability vector.
+    """
+
+    def __init__(self, classifier, max_batch=TEXT_BATCH_SIZE, max_wait=TEXT_BATCH_WAIT_MS / 1000.0):
+        self.classifier = classifier
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self.texts = 0
+        self.inference_seconds = 0.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._infer_lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, text):
+        future = Future()
+        self._queue.put((text, future))
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="vibefy-text-batcher", daemon=True)
+                self._thread.start()
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._process(batch)
+
+    def _process(self, batch):
+        try:
+            probs = self.classify([text for text, _ in batch])
+            for (_, future), p in zip(batch, probs):
+                future.set_result(p)
+        except Exception as e:
+            logger.exception("Text batcher failed on a batch")
+            for _, future in batch:
+                future.set_exception(e)
+
+    def classify(self, texts):
+        """Classify a ready-made batch on the caller's thread (used for bulk scoring)"""
+        with self._infer_lock:
+            start = time.perf_counter()
+            probs = self.classifier(texts)
+            elapsed = time.perf_counter() - start
+        with self._lock:
+            self.batches += 1
+            self.texts += len(texts)
+            self.inference_seconds += elapsed
+        logger.debug(f"Text batcher classified {len(texts)} text(s) in {elapsed:.3f}s")
+        return probs
+
+    def stats(self):
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "texts": self.texts,
+                "mean_batch_size": round(self.texts / self.batches, 2) if self.batches else 0.0,
+                "inference_seconds": round(self.inference_seconds, 3),
+                "pending": self._queue.qsize(),
+            }
+
+def get_text_classifier(quantized=None, model_path=None):
+    """
+    Return the shared registry entry for the local text model. Its "model" is
+    a TextBatcher wrapping a LocalTextClassifier; `quantized` defaults to
+    VIBEFY_TEXT_INT8 and `model_path` to VIBEFY_TEXT_MODEL_PATH.
+    """
+    quantized = TEXT_INT8 if quantized is None else quantized
+    model_path = model_path or TEXT_MODEL_PATH
+    return get_model(("text_classifier", model_path, bool(quantized)),
+                     lambda: TextBatcher(LocalTextClassifier(model_path, quantized=quantized)))
+
+def _analyze_text_local(text):
+    """Score one (validated, stripped) text with the local model"""
+    start = time.perf_counter()
+    probabilities = get_text_classifier()["model"].submit(text).result()
+    result = _result_from_probabilities(probabilities, labels=MOOD_LABELS)
+    logger.debug(f"Local text model answered in {time.perf_counter() - start:.3f}s")
+    logger.info(f"Text analysis result: {result['mood']} ({result['confidence']:.2f})")
+    return result
+
+# Process-wide HTTP session: connections (and their TCP/TLS handshakes) are
+# reused across calls and across Streamlit sessions.
+_http_session = None
+_http_session_lock = threading.Lock()
+
+def get_http_session():
+    """
+    Return the shared keep-alive session for HuggingFace API calls, creating it
+    on first use. Its urllib3 connection pool is thread-safe; callers pass
+    headers and timeouts per request rather than mutating the session.
+    """
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=4,
+                pool_maxsize=HF_POOL_MAXSIZE,
+                pool_block=False,  # burst above the limit opens extra, unpooled connections
+                max_retries=0,
+            )
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _http_session = session
+            atexit.register(close_http_session)
+            logger.info(f"Created HTTP session for HuggingFace API (pool size {HF_POOL_MAXSIZE})")
+        return _http_session
+
+def close_http_session():
+    """Close pooled connections; the next call to get_http_session starts a fresh pool"""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is not None:
+            _http_session.close()
+            _http_session = None
+
+_text_cache = None
+_text_cache_lock = threading.Lock()
+
+def get_text_cache():
+    """
+    Process-wide text analysis cache configured by the VIBEFY_TEXT_CACHE_*
+    settings; None when VIBEFY_TEXT_CACHE_ENTRIES=0.
+    """
+    global _text_cache
+    if TEXT_CACHE_ENTRIES <= 0:
+        return None
+    with _text_cache_lock:
+        if _text_cache is None:
+            _text_cache = ResultCache(
+                max_entries=TEXT_CACHE_ENTRIES,
+                max_bytes=int(TEXT_CACHE_MB * 1024 * 1024),
+                db_path=TEXT_CACHE_DB or None,
+                ttl=TEXT_CACHE_TTL or None,
+                max_disk_entries=TEXT_CACHE_DISK_ENTRIES or None,
+            )
+    return _text_cache
+
+def normalize_text(text):
+    """Collapse whitespace and case so trivially different inputs share a cache entry"""
+    return " ".join(text.split()).casefold()
+
+def _text_model_id(backend):
+    if backend == "local":
+        return f"local:{TEXT_MODEL_PATH}:{'int8' if TEXT_INT8 else 'fp32'}"
+    return f"api:{HF_MODEL_ID}"
+
+def _text_cache_key(text, backend):
+    """Cache key: digest of the normalised text plus the model that scores it"""
+    digest = hashlib.blake2b(normalize_text(text).encode('utf-8'), digest_size=16).hexdigest()
+    return f"text:{_text_model_id(backend)}:{digest}"
+
+class CircuitBreaker:
+    """
+    Closed -> open after `failure_threshold` consecutive failures; open calls
+    fail fast until `cooldown` seconds have passed, then a single half-open
+    probe decides whether to close again or reopen. A probe that reports no
+    outcome within `probe_timeout` seconds (default: the cooldown) is treated
+    as lost and the next call probes instead. hold_open() opens it for a known
+    period (e.g. while the remote model is loading).
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, cooldown=30.0, probe_timeout=None):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.probe_timeout = cooldown if probe_timeout is None else probe_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opens = 0
+        self.short_circuits = 0
+        self.successes = 0
+        self.total_failures = 0
+        self.failure_seconds = 0.0
+        self.probes = 0
+        self.lost_probes = 0
+        self._open_until = 0.0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        Whether a call may go ahead now (counts the call as short-circuited if
+        not). The half-open probe gets its probe number instead of True; a probe
+        that ends without record_success/record_failure (cancelled, or an
+        unexpected error) must hand it to release_probe().
+        """
+        with self._lock:
+            now = time.time()
+            if self.state == self.OPEN and now >= self._open_until:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+                logger.info("HuggingFace circuit half-open: probing")
+            if self.state == self.CLOSED:
+                return True
+            if (self.state == self.HALF_OPEN and self._probe_in_flight
+                    and now - self._probe_started >= self.probe_timeout):
+                logger.warning(f"HuggingFace circuit probe lost after {now - self._probe_started:.1f}s, probing again")
+                self.lost_probes += 1
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                self._probe_started = now
+                self.probes += 1
+                return self.probes
+            self.short_circuits += 1
+            return False
+
+    def release_probe(self, permit):
+        """Let the next call probe if the probe holding `permit` ended without an outcome"""
+        with self._lock:
+            if (permit is not True and self.state == self.HALF_OPEN and self._probe_in_flight
+                    and permit == self.probes):
+                self._probe_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("HuggingFace circuit closed")
+            self.state = self.CLOSED
+            self.failures = 0
+            self.successes += 1
+            self._probe_in_flight = False
+
+    def record_failure(self, seconds=0.0):
+        with self._lock:
+            self.failures += 1
+            self.total_failures += 1
+            self.failure_seconds += seconds
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self._open(self.cooldown)
+
+    def hold_open(self, seconds):
+        with self._lock:
+            self._open(seconds)
+
+    def _open(self, seconds):
+        if self.state != self.OPEN:
+            self.opens += 1
+            logger.warning(f"HuggingFace circuit open for {seconds:.1f}s")
+        self.state = self.OPEN
+        self._open_until = max(self._open_until, time.time() + seconds)
+        self._probe_in_flight = False
+
+    def stats(self):
+        with self._lock:
+            mean_failure = self.failure_seconds / self.total_failures if self.total_failures else 0.0
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "opens": self.opens,
+                "successes": self.successes,
+                "failures": self.total_failures,
+                "short_circuits": self.short_circuits,
+                "lost_probes": self.lost_probes,
+                "open_for_seconds": round(max(0.0, self._open_until - time.time()), 1) if self.state == self.OPEN else 0.0,
+                # Each fast failure would otherwise have waited about as long as a real failure
+                "seconds_saved": round(self.short_circuits * mean_failure, 2),
+            }
+
+# A probe still unanswered after the longest a single request may take is presumed lost
+_hf_breaker = CircuitBreaker(HF_BREAKER_FAILURES, HF_BREAKER_COOLDOWN,
+                             probe_timeout=max(HF_LATENCY_BUDGET, HF_CONNECT_TIMEOUT + HF_READ_TIMEOUT))
+_hf_stats = {"requests": 0, "retries": 0, "model_loading_waits": 0, "budget_exhausted": 0,
+             "warmup": None, "warmup_seconds": None}
+_hf_stats_lock = threading.Lock()
+
+def _count_hf(name, amount=1):
+    with _hf_stats_lock:
+        _hf_stats[name] += amount
+
+def get_hf_resilience_stats():
+    """Circuit breaker state plus retry, cold-start and warm-up counters for the HuggingFace endpoint"""
+    with _hf_stats_lock:
+        stats = dict(_hf_stats)
+    stats["breaker"] = _hf_breaker.stats()
+    return stats
+
+def _hf_estimated_time(response):
+    """Seconds until the model is loaded, from the API's 503 body ({"error": ..., "estimated_time": 20.0})"""
+    try:
+        return float(response.json().get("estimated_time"))
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+def start_hf_warmup():
+    """
+    Send one request in a background thread so a cold HuggingFace model starts
+    loading before the first user needs it. Runs at most once per process and
+    uses the standard library, so it doesn't pull requests into page start-up.
+    """
+    with _hf_stats_lock:
+        if not HF_WARMUP or DEFAULT_TEXT_BACKEND != "api" or _hf_stats["warmup"] is not None:
+            return
+        _hf_stats["warmup"] = "running"
+    threading.Thread(target=_hf_warmup, name="vibefy-hf-warmup", daemon=True).start()
+
+def _hf_warmup():
+    import urllib.request
+    import urllib.error
+    
+    token = os.getenv("HF_TOKEN")
+    if not token:
+        with _hf_stats_lock:
+            _hf_stats["warmup"] = "skipped"
+        return
+    payload = json.dumps({"inputs": "warm up", "options": {"wait_for_model": True}}).encode('utf-8')
+    request = urllib.request.Request(HF_API_URL, data=payload, method="POST", headers={
+        "Authorization": f"Bearer {token}", "Content-Type": "application/json"})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=120) as response:
+            response.read()
+        status = "ok"
+        _hf_breaker.record_success()
+    except (urllib.error.URLError, OSError) as e:
+        logger.warning(f"HuggingFace warm-up failed: {str(e)}")
+        status = "failed"
+    elapsed = time.perf_counter() - start
+    with _hf_stats_lock:
+        _hf_stats["warmup"] = status
+        _hf_stats["warmup_seconds"] = round(elapsed, 2)
+    logger.info(f"HuggingFace warm-up {status} in {elapsed:.1f}s")
+
+def _is_valid_text(text):
+    return bool(text) and isinstance(text, str) and text.strip() != ""
+
+def _hf_headers():
+    """Authorization headers for the HuggingFace API (None if HF_TOKEN is missing)"""
+    HF_TOKEN = os.getenv("HF_TOKEN")
+    if not HF_TOKEN:
+        logger.error("HF_TOKEN not found in environment variables")
+        return None
+    return {"Authorization": f"Bearer {HF_TOKEN}"}
+
+def _classify_hf_response(response, elapsed, deadline):
+    """
+    Record one HuggingFace API answer with the circuit breaker and decide what
+    to do next; shared by _post_hf and post_hf_async, so `response` may come
+    from requests or httpx. Returns (action, value):
+    - ("ok", parsed JSON) for a 200;
+    - ("wait", seconds) when the model is loading and will be ready before
+      `deadline` (loading beyond it holds the breaker open and gives up);
+    - ("retry", Retry-After seconds or None) for 429 and other 5xx answers;
+    - ("give_up", None) for other errors (e.g. 401): the endpoint is up, the
+      request itself was rejected.
+    """
+    logger.debug(f"HuggingFace API responded with {response.status_code} in {elapsed:.3f}s")
+    if response.status_code == 200:
+        _hf_breaker.record_success()
+        result = response.json()
+        logger.debug(f"API Response: {result}")
+        return "ok", result
+    
+    estimated = _hf_estimated_time(response) if response.status_code == 503 else None
+    if estimated is not None:
+        # Model is loading: not the endpoint's fault, and retrying sooner won't help
+        _count_hf("model_loading_waits")
+        if time.perf_counter() + estimated >= deadline:
+            logger.warning(f"HuggingFace model loading ({estimated:.0f}s), beyond the latency budget")
+            _hf_breaker.hold_open(estimated)
+            _count_hf("budget_exhausted")
+            return "give_up", None
+        logger.info(f"HuggingFace model loading, waiting {estimated:.1f}s")
+        _hf_breaker.record_success()  # release a half-open probe
+        return "wait", estimated
+    if response.status_code == 429 or response.status_code >= 500:
+        logger.error(f"HuggingFace API error: {response.status_code} - {response.text[:200]}")
+        _hf_breaker.record_failure(elapsed)
+        return "retry", _retry_after(response)
+    logger.error(f"HuggingFace API error: {response.status_code} - {response.text}")
+    _hf_breaker.record_success()
+    return "give_up", None
+
+def _hf_retry_wait(attempt, wait, loading, deadline):
+    """
+    Seconds to sleep before the next attempt (`wait` from the last answer, else
+    jittered backoff), or None once retries or the latency budget run out. A
+    model that is loading is waited for regardless of the retry count.
+    """
+    if attempt >= HF_MAX_RETRIES and not loading:
+        return None
+    if wait is None:
+        # Full jitter keeps concurrent sessions from retrying in lockstep
+        wait = random.uniform(0, HF_BACKOFF_SECONDS * 2 ** (attempt + 1))
+    if time.perf_counter() + wait >= deadline:
+        _count_hf("budget_exhausted")
+        return None
+    _count_hf("retries")
+    return wait
+
+def _post_hf(inputs, headers, budget=None):
+    """
+    POST one input (str) or a batch (list) to the HuggingFace API; returns the
+    parsed JSON or None. The whole call, retries included, stays within
+    `budget` seconds (default VIBEFY_HF_LATENCY_BUDGET):
+    - while the circuit breaker is open it returns None immediately;
+    - a 503 "model loading" answer waits out its estimated_time if that fits
+      the budget, otherwise holds the breaker open for that long;
+    - timeouts, connection errors, 429 and other 5xx answers are retried with
+      jittered exponential backoff (honouring Retry-After);
+    - other errors (e.g. 401) are returned as None straight away.
+    """
+    deadline = time.perf_counter() + (HF_LATENCY_BUDGET if budget is None else budget)
+    attempt = 0
+    while True:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            _count_hf("budget_exhausted")
+            return None
+        permit = _hf_breaker.allow()
+        if not permit:
+            logger.warning("HuggingFace circuit open, skipping request")
+            return None
+        
+        logger.debug("Sending request to HuggingFace API")
+        _count_hf("requests")
+        start = time.perf_counter()
+        wait, loading = None, False
+        try:
+            response = get_http_session().post(
+                HF_API_URL, 
+                headers=headers, 
+                json={"inputs": inputs}, 
+                timeout=(min(HF_CONNECT_TIMEOUT, remaining), min(HF_READ_TIMEOUT, remaining))
+            )
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            logger.error(f"HuggingFace API request failed: {str(e)}")
+            _hf_breaker.record_failure(time.perf_counter() - start)
+        except BaseException:
+            # Other errors propagate, but must not leave a half-open probe in flight
+            _hf_breaker.release_probe(permit)
+            raise
+        else:
+            action, value = _classify_hf_response(response, time.perf_counter() - start, deadline)
+            if action == "ok":
+                return value
+            if action == "give_up":
+                return None
+            wait, loading = value, action == "wait"
         
-        result = {"mood": normalized_emotion, "confidence": float(confidence)}
-        logger.info(f"Final result: {result}")
-        return result
+        wait = _hf_retry_wait(attempt, wait, loading, deadline)
+        if wait is None:
+            return None
+        attempt += 1
+        time.sleep(wait)
+
+async def post_hf_async(client, inputs, budget=None):
+    """
+    _post_hf on an httpx.AsyncClient: same circuit breaker, retries, model
+    loading waits and latency budget, but awaits instead of blocking. If the
+    caller is cancelled mid-request, a half-open probe is released rather than
+    counted as a failure.
+    """
+    import httpx
     
-    except Exception as e:
-        logger.exception(f"Error in detect_from_face: {str(e)}")
+    headers = _hf_headers()
+    if headers is None:
+        return None
+    deadline = time.perf_counter() + (HF_LATENCY_BUDGET if budget is None else budget)
+    attempt = 0
+    while True:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            _count_hf("budget_exhausted")
+            return None
+        permit = _hf_breaker.allow()
+        if not permit:
+            logger.warning("HuggingFace circuit open, skipping request")
+            return None
+        
+        _count_hf("requests")
+        start = time.perf_counter()
+        wait, loading = None, False
+        try:
+            response = await client.post(
+                HF_API_URL,
+                headers=headers,
+                json={"inputs": inputs},
+                timeout=httpx.Timeout(min(HF_READ_TIMEOUT, remaining), connect=min(HF_CONNECT_TIMEOUT, remaining))
+            )
+        except httpx.TransportError as e:
+            logger.error(f"HuggingFace API request failed: {str(e)}")
+            _hf_breaker.record_failure(time.perf_counter() - start)
+        except BaseException:
+            _hf_breaker.release_probe(permit)
+            raise
+        else:
+            action, value = _classify_hf_response(response, time.perf_counter() - start, deadline)
+            if action == "ok":
+                return value
+            if action == "give_up":
+                return None
+            wait, loading = value, action == "wait"
+        
+        wait = _hf_retry_wait(attempt, wait, loading, deadline)
+        if wait is None:
+            return None
+        attempt += 1
+        await asyncio.sleep(wait)
+
+def _text_probabilities(scores):
+    """
+    MOOD_LABELS-ordered float32 distribution from the API's full list of label
+    scores; None unless every mood is present
+    """
+    by_mood = {}
+    for item in scores:
+        if isinstance(item, dict) and 'label' in item:
+            by_mood[normalize_emotion(item['label'])] = float(item.get('score', 0.0))
+    if not all(mood in by_mood for mood in MOOD_LABELS):
+        return None
+    return np.asarray([by_mood[mood] for mood in MOOD_LABELS], dtype=np.float32)
+
+def _text_result_from_scores(scores):
+    """
+    Turn the API's scores for one input (a list of {"label", "score"} sorted by
+    score, or just the top dict) into {"mood", "confidence"}; None if malformed.
+    When every label is scored the distribution is kept under "probabilities".
+    """
+    probabilities = None
+    if isinstance(scores, list):
+        probabilities = _text_probabilities(scores)
+        scores = scores[0] if scores else None
+    if not isinstance(scores, dict):
+        return None
+    
+    emotion = scores.get('label', 'neutral')
+    score = scores.get('score', 0.0)
+    
+    # Validate score
+    if score < 0.1:  # Minimum confidence threshold
+        logger.warning(f"Low confidence in text analysis: {score}")
+        return {"mood": "neutral", "confidence": 0.0}
+    
+    # Normalize emotion label
+    result = {"mood": normalize_emotion(emotion), "confidence": float(score)}
+    if probabilities is not None:
+        result["probabilities"] = probabilities
+    return result
+
+# Words that signal each mood (weight 1 unless given). Kept small and
+# unambiguous: anything the lexicon is unsure about goes to the transformer.
+EMOTION_LEXICON = {
+    'anger': ('angry', 'anger', 'mad', 'furious', 'rage', 'raging', 'annoyed', 'annoying', 'irritated',
+              'irritating', 'frustrated', 'frustrating', 'pissed', 'outraged', 'livid', 'hate', 'hated',
+              'resent', 'infuriating', 'infuriated', ('fuming', 1.5)),
+    'disgust': ('disgusted', 'disgusting', 'gross', 'revolting', 'repulsive', 'nasty', 'sickening', 'vile',
+                'yuck', 'ew', 'eww', 'nauseating', 'repulsed', 'grossed'),
+    'fear': ('afraid', 'scared', 'fear', 'frightened', 'terrified', 'worried', 'worry', 'worrying', 'anxious',
+             'anxiety', 'nervous', 'panic', 'panicking', 'dread', 'dreading', 'uneasy', 'tense', 'stressed',
+             ('terrifying', 1.5)),
+    'joy': ('happy', 'happiness', 'glad', 'joy', 'joyful', 'excited', 'exciting', 'great', 'wonderful',
+            'amazing', 'awesome', 'fantastic', 'delighted', 'thrilled', 'love', 'loved', 'lovely', 'cheerful',
+            'grateful', 'thankful', 'proud', 'fun', 'enjoy', 'enjoyed', 'yay', ('ecstatic', 1.5)),
+    'sadness': ('sad', 'sadness', 'unhappy', 'depressed', 'depressing', 'lonely', 'alone', 'miserable',
+                'heartbroken', 'upset', 'crying', 'cried', 'cry', 'grief', 'grieving', 'hopeless',
+                'gloomy', 'disappointed', ('devastated', 1.5)),
+    'surprise': ('surprised', 'surprise', 'surprising', 'shocked', 'shocking', 'astonished', 'amazed',
+                 'unexpected', 'wow', 'whoa', 'stunned', 'speechless', ('unbelievable', 0.5)),
+    'neutral': ('normal', 'fine', 'okay', 'ok', 'alright', 'calm', 'usual', 'ordinary', 'meh', 'regular',
+                'average'),
+}
+NEGATIONS = frozenset(('not', 'no', 'never', 'nothing', 'hardly', 'barely', 'without', 'nobody', 'neither', 'nor'))
+INTENSIFIERS = {'so': 1.5, 'very': 1.5, 'really': 1.5, 'extremely': 2.0, 'super': 1.5, 'totally': 1.5,
+                'incredibly': 2.0, 'absolutely': 1.5, 'truly': 1.5, 'too': 1.25, 'slightly': 0.5, 'bit': 0.5}
+# Where a negated mood word's weight goes ("not happy" reads as sadness, "not angry" as neutral)
+NEGATION_TARGETS = {'anger': ('neutral', 0.5), 'disgust': ('neutral', 0.5), 'fear': ('neutral', 0.5),
+                    'joy': ('sadness', 1.0), 'sadness': ('joy', 0.5), 'surprise': ('neutral', 0.5),
+                    'neutral': (None, 0.0)}
+# Words that set two feelings against each other; the lexicon can't weigh those
+CONTRASTS = frozenset(('but', 'though', 'although', 'however', 'yet', 'except', 'despite'))
+
+_LEXICON_TOKEN = re.compile(r"[a-z]+(?:'[a-z]+)?|[.!?,;:]")
+
+class LexiconScorer:
+    """
+    Vectorised, negation-aware lexicon scorer. The lexicon is a (vocabulary x
+    7) weight matrix; a text is scored by gathering the rows of its words,
+    scaling them by intensifiers, routing negated words through a 7x7
+    negation matrix and summing. A negation only flips a mood word right after
+    it (intensifiers aside); one followed by anything else ("not sure if I'm
+    happy") is reported as loose. Returns a MOOD_LABELS-ordered distribution
+    (with a small prior on every mood), the raw evidence total, the number of
+    words, the share of them that carry emotion, whether a contrast word
+    occurs and whether a negation is loose.
+    """
+
+    def __init__(self, lexicon=None, prior=0.1):
+        lexicon = lexicon or EMOTION_LEXICON
+        self.prior = prior
+        self.vocabulary = {}
+        rows = []
+        for mood, words in lexicon.items():
+            column = MOOD_LABELS.index(mood)
+            for entry in words:
+                word, weight = entry if isinstance(entry, tuple) else (entry, 1.0)
+                if word not in self.vocabulary:
+                    self.vocabulary[word] = len(rows)
+                    rows.append(np.zeros(len(MOOD_LABELS), dtype=np.float32))
+                rows[self.vocabulary[word]][column] += weight
+        self.weights = np.stack(rows)
+        self.negation = np.zeros((len(MOOD_LABELS), len(MOOD_LABELS)), dtype=np.float32)
+        for mood, (target, weight) in NEGATION_TARGETS.items():
+            if target is not None:
+                self.negation[MOOD_LABELS.index(mood), MOOD_LABELS.index(target)] = weight
+
+    def score(self, text):
+        ids, scales, negated = [], [], []
+        scale, negating = 1.0, False
+        words = modifiers = 0
+        contrast = loose_negation = False
+        for token in _LEXICON_TOKEN.findall(text.lower()):
+            if not token[0].isalpha():
+                loose_negation = loose_negation or negating
+                negating, scale = False, 1.0
+                continue
+            words += 1
+            contrast = contrast or token in CONTRASTS
+            if token in NEGATIONS or token.endswith("n't"):
+                negating = True
+                modifiers += 1
+                continue
+            if token in INTENSIFIERS:
+                scale *= INTENSIFIERS[token]
+                modifiers += 1
+                continue
+            row = self.vocabulary.get(token)
+            if row is not None:
+                ids.append(row)
+                scales.append(scale)
+                negated.append(negating)
+            else:
+                # Which word the negation belongs to is a guess from here on
+                loose_negation = loose_negation or negating
+            scale, negating = 1.0, False
+        loose_negation = loose_negation or negating
+
+        scores = np.zeros(len(MOOD_LABELS), dtype=np.float32)
+        if ids:
+            contributions = self.weights[ids] * np.asarray(scales, dtype=np.float32)[:, np.newaxis]
+            negated = np.asarray(negated)
+            scores = contributions[~negated].sum(axis=0) + contributions[negated].sum(axis=0) @ self.negation
+        evidence = float(scores.sum())
+        probabilities = (scores + self.prior) / (evidence + self.prior * len(MOOD_LABELS))
+        coverage = (len(ids) + modifiers) / words if ids else 0.0
+        return probabilities.astype(np.float32), evidence, words, coverage, contrast, loose_negation
+
+_lexicon_scorer = None
+_lexicon_stats = {"answered": 0, "escalated": 0, "seconds": 0.0}
+_lexicon_lock = threading.Lock()
+
+def get_lexicon_scorer():
+    global _lexicon_scorer
+    with _lexicon_lock:
+        if _lexicon_scorer is None:
+            _lexicon_scorer = LexiconScorer()
+    return _lexicon_scorer
+
+def score_lexicon(text, margin=None):
+    """
+    Score `text` with the lexicon. Returns {"mood", "confidence", "probabilities"}
+    for a short text (at most VIBEFY_LEXICON_MAX_WORDS words, no contrast word,
+    every negation directly before a mood word) whose emotion-bearing words make up at least VIBEFY_LEXICON_MIN_COVERAGE of
+    it and whose top mood leads the runner-up by at least `margin` (default
+    VIBEFY_LEXICON_MARGIN); None when the text should go to the transformer.
+    """
+    margin = LEXICON_MARGIN if margin is None else margin
+    start = time.perf_counter()
+    probabilities, evidence, words, coverage, contrast, loose_negation = get_lexicon_scorer().score(text)
+    top, runner_up = np.sort(probabilities)[-2:][::-1]
+    if evidence <= 0:
+        reason = "no mood words"
+    elif words > LEXICON_MAX_WORDS:
+        reason = f"{words} words, more than {LEXICON_MAX_WORDS}"
+    elif contrast:
+        reason = "contrasting clauses"
+    elif loose_negation:
+        reason = "negation not directly before a mood word"
+    elif coverage < LEXICON_MIN_COVERAGE:
+        reason = f"coverage {coverage:.2f} below {LEXICON_MIN_COVERAGE:.2f}"
+    elif top - runner_up < margin:
+        reason = f"margin {top - runner_up:.2f} below {margin:.2f}"
+    else:
+        reason = None
+    elapsed = time.perf_counter() - start
+    with _lexicon_lock:
+        _lexicon_stats["escalated" if reason else "answered"] += 1
+        _lexicon_stats["seconds"] += elapsed
+    if reason:
+        logger.debug(f"Lexicon escalating ({reason})")
+        return None
+    idx = int(np.argmax(probabilities))
+    return {"mood": MOOD_LABELS[idx], "confidence": float(probabilities[idx]), "probabilities": probabilities}
+
+def get_lexicon_stats():
+    """How often the lexicon answered vs escalated to the transformer, and its mean latency"""
+    with _lexicon_lock:
+        stats = dict(_lexicon_stats)
+    calls = stats["answered"] + stats["escalated"]
+    stats["escalation_rate"] = round(stats["escalated"] / calls, 3) if calls else 0.0
+    stats["mean_microseconds"] = round(stats.pop("seconds") / calls * 1e6, 1) if calls else 0.0
+    return stats
+
+_SENTENCE_END = re.compile(r'(?<=[.!?…])\s+|\n+')
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+def split_sentences(text):
+    """Split text after ., !, ? or … and at line breaks; empty pieces are dropped"""
+    return [sentence.strip() for sentence in _SENTENCE_END.split(text) if sentence.strip()]
+
+def estimate_tokens(text):
+    """Cheap token count (words plus punctuation), a lower bound on the model's subword tokens"""
+    return len(_TOKEN.findall(text))
+
+def chunk_text(text, max_tokens=None):
+    """
+    Group whole sentences into chunks of at most `max_tokens` estimated tokens
+    (default VIBEFY_TEXT_CHUNK_TOKENS). A sentence longer than that is split
+    between words. Returns a list of chunk strings in text order.
+    """
+    max_tokens = max_tokens or TEXT_CHUNK_TOKENS
+    chunks, current, current_tokens = [], [], 0
+    for sentence in split_sentences(text):
+        tokens = estimate_tokens(sentence)
+        if tokens > max_tokens:
+            words = sentence.split()
+            step = max(1, len(words) * max_tokens // tokens)
+            pieces = [" ".join(words[i:i + step]) for i in range(0, len(words), step)]
+        else:
+            pieces = [sentence]
+        for piece in pieces:
+            piece_tokens = estimate_tokens(piece)
+            if current and current_tokens + piece_tokens > max_tokens:
+                chunks.append(" ".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+def result_distribution(result):
+    """
+    MOOD_LABELS-ordered distribution for a result: its "probabilities" when
+    present, otherwise its confidence on its mood and the rest spread evenly
+    """
+    if result.get("probabilities") is not None:
+        distribution = np.asarray(result["probabilities"], dtype=np.float32)
+        return distribution / max(float(distribution.sum()), 1e-6)
+    distribution = np.full(len(MOOD_LABELS), (1.0 - result["confidence"]) / (len(MOOD_LABELS) - 1), dtype=np.float32)
+    distribution[MOOD_LABELS.index(result["mood"])] = result["confidence"]
+    return distribution
+
+def combine_text_results(results, weights):
+    """
+    Weighted average of the results' distributions (results with the neutral/0.0
+    fallback are left out) as {"mood", "confidence", "probabilities"}
+    """
+    scored = [(result_distribution(r), w) for r, w in zip(results, weights)
+              if r and (r.get("mood") != "neutral" or r.get("confidence", 0) > 0) and w > 0]
+    if not scored:
         return {"mood": "neutral", "confidence": 0.0}
+    distribution = np.average([d for d, _ in scored], axis=0, weights=[w for _, w in scored]).astype(np.float32)
+    idx = int(np.argmax(distribution))
+    return {"mood": MOOD_LABELS[idx], "confidence": float(distribution[idx]), "probabilities": distribution}
+
+def _analyze_chunked(text, backend, use_cache, use_lexicon=None):
+    """Score a long text as sentence-bounded chunks in parallel batches, weighted by chunk length"""
+    chunks = chunk_text(text)
+    start = time.perf_counter()
+    results = analyze_texts(chunks, backend=backend, use_cache=use_cache, use_lexicon=use_lexicon,
+                            max_concurrency=HF_POOL_MAXSIZE if backend == "api" else 1)
+    combined = combine_text_results(results, [estimate_tokens(chunk) for chunk in chunks])
+    combined["chunks"] = len(chunks)
+    logger.info(f"Scored {len(chunks)} chunk(s) of a {estimate_tokens(text)}-token text in "
+                f"{time.perf_counter() - start:.2f}s: {combined['mood']} ({combined['confidence']:.2f})")
+    return combined
 
-def analyze_text(text):
+def analyze_text(text, backend=None, use_cache=True, use_lexicon=None):
     """
-    Takes user's text, sends to HuggingFace API
+    Takes user's text, sends to HuggingFace API (backend "api") or scores it
+    with the same model locally (backend "local"); defaults to VIBEFY_TEXT_BACKEND.
+    Short, unambiguous texts are answered by the local lexicon (use_lexicon,
+    default VIBEFY_TEXT_LEXICON) and repeated (normalised) texts from the text cache.
     Returns: {"mood": "fear", "confidence": 0.78}
     """
+    backend = backend or DEFAULT_TEXT_BACKEND
+    if backend not in TEXT_BACKENDS:
+        raise ValueError(f"Unknown text backend: {backend} (expected one of {TEXT_BACKENDS})")
     try:
-        logger.info(f"Starting text analysis for input: {text[:50]}...")  # Log first 50 chars
+        logger.info(f"Starting text analysis for input: {str(text)[:50]}...")  # Log first 50 chars
         
-        HF_TOKEN = os.getenv("HF_TOKEN")
-        if not HF_TOKEN:
-            logger.error("HF_TOKEN not found in environment variables")
-            return {"mood": "neutral", "confidence": 0.0}
-        
-        if not text or not isinstance(text, str) or text.strip() == "":
+        if not _is_valid_text(text):
             logger.error("Invalid or empty text input")
             return {"mood": "neutral", "confidence": 0.0}
         
-        API_URL = "https://api-inference.huggingface.co/models/j-hartmann/emotion-english-distilroberta-base"
-        headers = {"Authorization": f"Bearer {HF_TOKEN}"}
+        long_text = estimate_tokens(text) > TEXT_CHUNK_TOKENS
+        if (TEXT_LEXICON if use_lexicon is None else use_lexicon) and not long_text:
+            lexicon_result = score_lexicon(text)
+            if lexicon_result is not None:
+                logger.info(f"Text analysis answered by lexicon: {lexicon_result['mood']} ({lexicon_result['confidence']:.2f})")
+                return lexicon_result
         
-        logger.debug("Sending request to HuggingFace API")
-        response = requests.post(
-            API_URL, 
-            headers=headers, 
-            json={"inputs": text.strip()}, 
-            timeout=10
-        )
+        cache = get_text_cache() if use_cache else None
+        if cache is not None:
+            cache_key = _text_cache_key(text, backend)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Text analysis cache hit: {cached['mood']} ({cached['confidence']:.2f})")
+                return cached
+        
+        if long_text:
+            final_result = _analyze_chunked(text.strip(), backend, use_cache, use_lexicon)
+            if cache is not None and final_result["confidence"] > 0:
+                cache.put(cache_key, final_result)
+            return final_result
         
-        if response.status_code != 200:
-            logger.error(f"HuggingFace API error: {response.status_code} - {response.text}")
+        if backend == "local":
+            final_result = _analyze_text_local(text.strip())
+            if cache is not None:
+                cache.put(cache_key, final_result)
+            return final_result
+        
+        headers = _hf_headers()
+        if headers is None:
             return {"mood": "neutral", "confidence": 0.0}
         
-        result = response.json()
-        logger.debug(f"API Response: {result}")
+        result = _post_hf(text.strip(), headers)
+        if result is None:
+            return {"mood": "neutral", "confidence": 0.0}
         
         if isinstance(result, list) and len(result) > 0:
-            # Result is already sorted by score
-            top = result[0][0] if isinstance(result[0], list) else result[0]
-            
-            emotion = top.get('label', 'neutral')
-            score = top.get('score', 0.0)
-            
-            # Validate score
-            if score < 0.1:  # Minimum confidence threshold
-                logger.warning(f"Low confidence in text analysis: {score}")
-                return {"mood": "neutral", "confidence": 0.0}
-            
-            # Normalize emotion label
-            normalized_emotion = normalize_emotion(emotion)
-            
-            final_result = {"mood": normalized_emotion, "confidence": float(score)}
-            logger.info(f"Text analysis result: {final_result}")
-            return final_result
+            final_result = _text_result_from_scores(result[0])
+            if final_result is not None:
+                logger.info(f"Text analysis result: {final_result}")
+                if cache is not None:
+                    cache.put(cache_key, final_result)
+                return final_result
         
         logger.warning(f"Unexpected API response format: {result}")
         return {"mood": "neutral", "confidence": 0.0}
@@ -184,6 +2275,151 @@ def analyze_text(text):
         logger.exception(f"Error in text analysis: {str(e)}")
         return {"mood": "neutral", "confidence": 0.0}
 
+async def analyze_text_api_async(text, client, use_cache=True, use_lexicon=None):
+    """
+    analyze_text on the "api" backend for a short text (at most
+    VIBEFY_TEXT_CHUNK_TOKENS), awaiting the request on an httpx.AsyncClient
+    instead of blocking a thread: the same lexicon, text cache and
+    post_hf_async. Longer texts belong to analyze_text, which chunks them.
+    Returns: {"mood": "fear", "confidence": 0.78}
+    """
+    try:
+        if not _is_valid_text(text):
+            logger.error("Invalid or empty text input")
+            return {"mood": "neutral", "confidence": 0.0}
+        
+        if TEXT_LEXICON if use_lexicon is None else use_lexicon:
+            lexicon_result = score_lexicon(text)
+            if lexicon_result is not None:
+                return lexicon_result
+        
+        cache = get_text_cache() if use_cache else None
+        if cache is not None:
+            cache_key = _text_cache_key(text, "api")
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        result = await post_hf_async(client, text.strip())
+        if result is None:
+            return {"mood": "neutral", "confidence": 0.0}
+        final_result = _text_result_from_scores(result[0]) if isinstance(result, list) and result else None
+        if final_result is None:
+            logger.warning(f"Unexpected API response format: {result}")
+            return {"mood": "neutral", "confidence": 0.0}
+        if cache is not None:
+            cache.put(cache_key, final_result)
+        return final_result
+    
+    except Exception as e:
+        logger.exception(f"Error in text analysis: {str(e)}")
+        return {"mood": "neutral", "confidence": 0.0}
+
+def _score_text_batch(texts, backend, headers=None):
+    """Score a list of valid, stripped texts in one API request or one forward pass"""
+    if backend == "local":
+        probs = get_text_classifier()["model"].classify(texts)
+        return [_result_from_probabilities(p, labels=MOOD_LABELS) for p in probs]
+    
+    result = _post_hf(texts, headers)
+    if result is None:
+        raise RuntimeError(f"HuggingFace API returned no result for {len(texts)} text(s)")
+    if not isinstance(result, list) or len(result) != len(texts):
+        raise ValueError(f"Unexpected API response format for a batch of {len(texts)}: {str(result)[:200]}")
+    return [_text_result_from_scores(scores) or {"mood": "neutral", "confidence": 0.0} for scores in result]
+
+def analyze_texts(texts, batch_size=None, backend=None, use_cache=True, max_concurrency=1, use_lexicon=None):
+    """
+    Score many texts, `batch_size` (default VIBEFY_TEXT_BATCH_SIZE) per API
+    request or local forward pass, with up to `max_concurrency` batches in
+    flight. Returns one {"mood", "confidence"} per input, in input order.
+    Invalid or empty entries get the neutral fallback without being sent, and
+    a failed batch only falls back to neutral for its own items.
+    Texts the lexicon is sure about and cached texts are not sent, and
+    duplicates (after normalisation) are sent once.
+    """
+    backend = backend or DEFAULT_TEXT_BACKEND
+    if backend not in TEXT_BACKENDS:
+        raise ValueError(f"Unknown text backend: {backend} (expected one of {TEXT_BACKENDS})")
+    batch_size = batch_size or TEXT_BATCH_SIZE
+    
+    texts = list(texts)
+    results = [{"mood": "neutral", "confidence": 0.0} for _ in texts]
+    valid = [(i, text.strip()) for i, text in enumerate(texts) if _is_valid_text(text)]
+    if len(valid) < len(texts):
+        logger.warning(f"Skipping {len(texts) - len(valid)} invalid or empty text(s)")
+    
+    if TEXT_LEXICON if use_lexicon is None else use_lexicon:
+        escalated = []
+        for i, text in valid:
+            lexicon_result = score_lexicon(text) if estimate_tokens(text) <= TEXT_CHUNK_TOKENS else None
+            if lexicon_result is not None:
+                results[i] = lexicon_result
+            else:
+                escalated.append((i, text))
+        logger.debug(f"Lexicon answered {len(valid) - len(escalated)} of {len(valid)} text(s)")
+        valid = escalated
+    
+    cache = get_text_cache() if use_cache else None
+    duplicates = {}  # index of the text that is sent -> indices sharing its result
+    if cache is not None:
+        pending, first_by_key = [], {}
+        for i, text in valid:
+            cache_key = _text_cache_key(text, backend)
+            if cache_key in first_by_key:
+                duplicates[first_by_key[cache_key]].append(i)
+                continue
+            cached = cache.get(cache_key)
+            if cached is not None:
+                results[i] = cached
+                continue
+            first_by_key[cache_key] = i
+            duplicates[i] = []
+            pending.append((i, text, cache_key))
+        logger.debug(f"Text cache answered {len(valid) - len(pending)} of {len(valid)} text(s)")
+        valid = [(i, text) for i, text, _ in pending]
+        cache_keys = {i: cache_key for i, _, cache_key in pending}
+    if not valid:
+        return results
+    
+    headers = None
+    if backend == "api":
+        headers = _hf_headers()
+        if headers is None:
+            return results
+    
+    def score(batch):
+        try:
+            return batch, _score_text_batch([text for _, text in batch], backend, headers)
+        except Exception as e:
+            logger.error(f"Text batch starting at item {batch[0][0]} failed: {str(e)}")
+            return batch, None
+    
+    start = time.perf_counter()
+    failed = 0
+    batches = [valid[offset:offset + batch_size] for offset in range(0, len(valid), batch_size)]
+    if max_concurrency > 1 and len(batches) > 1:
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(batches))) as executor:
+            outcomes = list(executor.map(score, batches))
+    else:
+        outcomes = map(score, batches)
+    for batch, scored in outcomes:
+        if scored is None:
+            failed += len(batch)
+            continue
+        for (i, _), result in zip(batch, scored):
+            results[i] = result
+            if cache is not None:
+                cache.put(cache_keys[i], result)
+                for j in duplicates[i]:
+                    results[j] = result
+    
+    elapsed = time.perf_counter() - start
+    rate = len(valid) / elapsed if elapsed > 0 else 0.0
+    logger.info(f"Scored {len(valid)} text(s) ({failed} failed) in {elapsed:.2f}s = {rate:.1f} texts/s "
+                f"(backend {backend}, batch size {batch_size})")
+    return results
+
 def get_emotion_description(mood):
     """Get a friendly description for each emotion"""
     descriptions = {
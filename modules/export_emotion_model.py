@@ -0,0 +1,68 @@
+"""
+Export FER's Keras emotion classifier to ONNX so it can run without TensorFlow.
+
+Usage (from the repo root, in an environment with tensorflow + tf2onnx):
+    python -m modules.export_emotion_model --quantize
+
+Writes VIBEFY_EMOTION_ONNX_MODEL (default models/emotion_model.onnx) and, with
+--quantize, an int8 copy next to it (models/emotion_model.int8.onnx).
+"""
+import os
+import sys
+import argparse
+import logging
+
+from modules.emotion_detector import EMOTION_ONNX_MODEL, _load_emotion_classifier
+
+logger = logging.getLogger('vibefy')
+
+
+def export_onnx(output_path, opset=13):
+    """Convert the Keras model to ONNX with an NCHW float32 input"""
+    import tensorflow as tf
+    import tf2onnx
+
+    model = _load_emotion_classifier()
+    _, height, width, channels = model.input_shape
+    spec = (tf.TensorSpec((None, height, width, channels), tf.float32, name="input"),)
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    tf2onnx.convert.from_keras(
+        model,
+        input_signature=spec,
+        opset=opset,
+        inputs_as_nchw=["input"],
+        output_path=output_path,
+    )
+    logger.info(f"Exported emotion classifier to {output_path}")
+    return output_path
+
+
+def quantize_int8(input_path, output_path):
+    """Dynamic int8 weight quantization with ONNX Runtime"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(input_path, output_path, weight_type=QuantType.QUInt8)
+    logger.info(f"Wrote int8 emotion classifier to {output_path}")
+    return output_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the FER emotion classifier to ONNX")
+    parser.add_argument("--output", default=EMOTION_ONNX_MODEL, help="Path of the float32 ONNX model")
+    parser.add_argument("--opset", type=int, default=13)
+    parser.add_argument("--quantize", action="store_true", help="Also write an int8-quantized copy")
+    args = parser.parse_args(argv)
+
+    export_onnx(args.output, opset=args.opset)
+    print(f"Wrote {args.output}")
+    if args.quantize:
+        root, ext = os.path.splitext(args.output)
+        int8_path = f"{root}.int8{ext}"
+        quantize_int8(args.output, int8_path)
+        print(f"Wrote {int8_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
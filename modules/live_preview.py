@@ -0,0 +1,116 @@
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict
+
+from modules.emotion_detector import (
+    analyze_texts,
+    combine_text_results,
+    estimate_tokens,
+    normalize_text,
+    split_sentences,
+)
+
+logger = logging.getLogger('vibefy')
+
+# Minimum time between scoring passes while the user is typing
+LIVE_DEBOUNCE_SECONDS = float(os.getenv('VIBEFY_LIVE_DEBOUNCE_SECONDS', '0.6'))
+# Sentence results remembered per preview
+LIVE_MEMO_SENTENCES = int(os.getenv('VIBEFY_LIVE_MEMO_SENTENCES', '512'))
+
+
+class LiveMoodPreview:
+    """
+    Running mood estimate for a text that is being edited. Each update splits
+    the text into sentences and scores only the ones not seen before (one
+    batched call); the rest come from a per-sentence memo. The estimate is the
+    token-weighted combination of every sentence's distribution, so the work
+    per update tracks what changed rather than the length of the text.
+    Updates closer together than `debounce` seconds are deferred (the previous
+    estimate is returned and the caller retries later), unless forced. Callers
+    that already get text in deliberate steps, like the Streamlit page, force.
+    """
+
+    def __init__(self, debounce=None, memo_size=None, backend=None):
+        self.debounce = LIVE_DEBOUNCE_SECONDS if debounce is None else debounce
+        self.memo_size = memo_size or LIVE_MEMO_SENTENCES
+        self.backend = backend
+        self.estimate = None
+        self.updates = 0
+        self.deferred = 0
+        self.sentences_scored = 0
+        self.sentences_reused = 0
+        self._memo = OrderedDict()  # normalised sentence -> result
+        self._last_text = None
+        self._last_update = 0.0
+        self._lock = threading.Lock()
+
+    def seconds_until_ready(self, text=None, now=None):
+        """How long to wait before the next update is allowed to score (0 if `text` is unchanged)"""
+        if text is not None and text == self._last_text:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        return max(0.0, self._last_update + self.debounce - now)
+
+    def update(self, text, force=False):
+        """
+        Re-score `text` incrementally and return the estimate: {"mood",
+        "confidence", "probabilities", "sentences", "rescored"}, or None for
+        empty text. Within the debounce window (unless `force`) the previous
+        estimate is returned unchanged.
+        """
+        with self._lock:
+            if text == self._last_text:
+                return self.estimate
+            if not force and self.seconds_until_ready() > 0:
+                self.deferred += 1
+                return self.estimate
+
+            start = time.perf_counter()
+            sentences = split_sentences(text or "")
+            keys = [normalize_text(sentence) for sentence in sentences]
+            changed = OrderedDict()
+            for key, sentence in zip(keys, sentences):
+                if key in self._memo:
+                    self._memo.move_to_end(key)
+                else:
+                    changed.setdefault(key, sentence)
+
+            if changed:
+                for key, result in zip(changed, analyze_texts(list(changed.values()), backend=self.backend)):
+                    # Failures (neutral/0.0) aren't remembered, so they are retried next time
+                    if result.get("confidence", 0) > 0:
+                        self._memo[key] = result
+                while len(self._memo) > self.memo_size:
+                    self._memo.popitem(last=False)
+
+            self.updates += 1
+            self.sentences_scored += len(changed)
+            self.sentences_reused += len(sentences) - len(changed)
+            self._last_text = text
+            self._last_update = time.monotonic()
+
+            if not sentences:
+                self.estimate = None
+                return None
+            results = [self._memo.get(key) for key in keys]
+            estimate = combine_text_results(results, [estimate_tokens(sentence) for sentence in sentences])
+            estimate["sentences"] = len(sentences)
+            estimate["rescored"] = len(changed)
+            self.estimate = estimate
+            logger.debug(f"Live preview: re-scored {len(changed)} of {len(sentences)} sentence(s) in "
+                         f"{time.perf_counter() - start:.3f}s -> {estimate['mood']} ({estimate['confidence']:.2f})")
+            return estimate
+
+    def stats(self):
+        with self._lock:
+            seen = self.sentences_scored + self.sentences_reused
+            return {
+                "updates": self.updates,
+                "deferred": self.deferred,
+                "sentences_scored": self.sentences_scored,
+                "sentences_reused": self.sentences_reused,
+                "reuse_rate": round(self.sentences_reused / seen, 3) if seen else 0.0,
+                "memo_size": len(self._memo),
+            }
@@ -0,0 +1,175 @@
+import os
+import time
+import asyncio
+import threading
+import logging
+
+import numpy as np
+
+from modules import emotion_detector
+from modules.emotion_detector import (
+    HF_CONNECT_TIMEOUT,
+    HF_POOL_MAXSIZE,
+    HF_READ_TIMEOUT,
+    MOOD_LABELS,
+    DEFAULT_TEXT_BACKEND,
+    _is_valid_text,
+    analyze_text,
+    analyze_text_api_async,
+    detect_from_bytes,
+    detect_from_frame,
+    estimate_tokens,
+    get_inference_pool,
+    result_distribution,
+)
+
+logger = logging.getLogger('vibefy')
+
+# Fusion weights per modality (renormalised over the modalities that answered)
+FACE_WEIGHT = float(os.getenv('VIBEFY_FUSION_FACE_WEIGHT', '0.5'))
+TEXT_WEIGHT = float(os.getenv('VIBEFY_FUSION_TEXT_WEIGHT', '0.5'))
+# A modality that takes longer than its timeout is left out of the fused result
+FACE_TIMEOUT = float(os.getenv('VIBEFY_FACE_TIMEOUT', '15'))
+TEXT_TIMEOUT = float(os.getenv('VIBEFY_TEXT_TIMEOUT', '10'))
+
+NEUTRAL_RESULT = {"mood": "neutral", "confidence": 0.0}
+
+# One event loop on a background thread serves every Streamlit session, so the
+# async HTTP client (and its keep-alive connections) is shared as well
+_loop = None
+_loop_lock = threading.Lock()
+_async_client = None
+_async_client_unavailable = False
+
+
+def _get_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="vibefy-multimodal-loop", daemon=True).start()
+    return _loop
+
+
+def _get_async_client():
+    """Shared httpx.AsyncClient (None if httpx isn't installed); only called on the background loop"""
+    global _async_client, _async_client_unavailable
+    if _async_client is None and not _async_client_unavailable:
+        try:
+            import httpx
+        except ImportError:
+            logger.warning("httpx not installed; text requests run on a thread with the requests session")
+            _async_client_unavailable = True
+            return None
+        _async_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(HF_READ_TIMEOUT, connect=HF_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_keepalive_connections=HF_POOL_MAXSIZE, max_connections=HF_POOL_MAXSIZE * 2),
+        )
+    return _async_client
+
+
+def is_usable(result):
+    """False for missing results and the neutral/0.0 fallback"""
+    return bool(result) and (result.get("mood") != "neutral" or result.get("confidence", 0) > 0)
+
+
+async def detect_face_async(image):
+    """
+    Face emotion for an encoded image (bytes) or a BGR frame, off the event loop:
+    on the shared inference pool when one is configured, else on a thread
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_inference_pool()
+    if pool is not None:
+        if isinstance(image, (bytes, bytearray)):
+            result, _ = await asyncio.wrap_future(pool.submit_bytes(bytes(image)))
+            return result
+        results, _, _ = await asyncio.wrap_future(pool.submit([image]))
+        return results[0]
+    if isinstance(image, (bytes, bytearray)):
+        return await loop.run_in_executor(None, detect_from_bytes, bytes(image))
+    return await loop.run_in_executor(None, detect_from_frame, image)
+
+
+async def analyze_text_async(text):
+    """
+    analyze_text without blocking the event loop: short texts go through
+    analyze_text_api_async on the shared async client. Long texts (chunked and
+    scored in parallel batches), the local backend and the API when httpx is
+    missing run analyze_text on a thread instead, so both entry points agree.
+    """
+    if not _is_valid_text(text):
+        logger.error("Invalid or empty text input")
+        return dict(NEUTRAL_RESULT)
+
+    client = _get_async_client() if DEFAULT_TEXT_BACKEND == "api" else None
+    if client is None or estimate_tokens(text) > emotion_detector.TEXT_CHUNK_TOKENS:
+        return await asyncio.get_running_loop().run_in_executor(None, analyze_text, text)
+    return await analyze_text_api_async(text, client)
+
+
+def fuse_results(results, weights):
+    """
+    Weighted average of the usable results' distributions, e.g.
+    fuse_results({"face": ..., "text": ...}, {"face": 0.6, "text": 0.4}).
+    Weights are renormalised over the modalities that produced a result.
+    Returns {"mood", "confidence", "probabilities"} or the neutral fallback.
+    """
+    usable = {name: r for name, r in results.items() if is_usable(r) and weights.get(name, 0) > 0}
+    if not usable:
+        return dict(NEUTRAL_RESULT)
+    total = sum(weights[name] for name in usable)
+    fused = sum(weights[name] / total * result_distribution(r) for name, r in usable.items())
+    idx = int(np.argmax(fused))
+    return {"mood": MOOD_LABELS[idx], "confidence": float(fused[idx]), "probabilities": fused.astype(np.float32)}
+
+
+async def _timed(name, coro, timeout):
+    """Run one modality with its own timeout; returns (name, result, status, seconds)"""
+    start = time.perf_counter()
+    try:
+        result = await asyncio.wait_for(coro, timeout)
+        status = "ok" if is_usable(result) else "no_result"
+    except asyncio.TimeoutError:
+        logger.warning(f"{name} detection timed out after {timeout:.1f}s")
+        result, status = None, "timeout"
+    except Exception as e:
+        logger.exception(f"{name} detection failed: {str(e)}")
+        result, status = None, "error"
+    return name, result, status, time.perf_counter() - start
+
+
+async def detect_multimodal(image=None, text=None, face_weight=None, text_weight=None,
+                            face_timeout=None, text_timeout=None):
+    """
+    Run face and text detection concurrently and fuse them. Either input may be
+    None. Wall time is roughly the slower of the two, capped by its timeout.
+    Returns the fused {"mood", "confidence", "probabilities"} plus "modalities":
+    {name: {"result", "status", "seconds"}} and "seconds" for the whole call.
+    """
+    start = time.perf_counter()
+    weights = {
+        "face": FACE_WEIGHT if face_weight is None else face_weight,
+        "text": TEXT_WEIGHT if text_weight is None else text_weight,
+    }
+    jobs = []
+    if image is not None:
+        jobs.append(_timed("face", detect_face_async(image), FACE_TIMEOUT if face_timeout is None else face_timeout))
+    if text is not None:
+        jobs.append(_timed("text", analyze_text_async(text), TEXT_TIMEOUT if text_timeout is None else text_timeout))
+
+    modalities = {}
+    for name, result, status, seconds in await asyncio.gather(*jobs):
+        modalities[name] = {"result": result, "status": status, "seconds": round(seconds, 3)}
+
+    fused = fuse_results({name: m["result"] for name, m in modalities.items()}, weights)
+    fused["modalities"] = modalities
+    fused["seconds"] = round(time.perf_counter() - start, 3)
+    logger.info(f"Multimodal result: {fused['mood']} ({fused['confidence']:.2f}) in {fused['seconds']:.2f}s, "
+                + ", ".join(f"{name} {m['status']} {m['seconds']:.2f}s" for name, m in modalities.items()))
+    return fused
+
+
+def detect_multimodal_sync(image=None, text=None, **kwargs):
+    """Blocking wrapper for Streamlit: runs detect_multimodal on the shared background loop"""
+    return asyncio.run_coroutine_threadsafe(detect_multimodal(image, text, **kwargs), _get_loop()).result()
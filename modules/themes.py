@@ -1,6 +1,5 @@
 # modules/themes.py
 import streamlit as st
-import requests
 import json
 import time
 
@@ -95,6 +94,7 @@ MOOD_CONFIG = {
 def load_lottie_url(url):
     """Load Lottie animation from URL"""
     try:
+        import requests  # only needed when an animation is actually fetched
         response = requests.get(url, timeout=5)
         if response.status_code == 200:
             return response.json()
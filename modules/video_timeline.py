@@ -0,0 +1,133 @@
+import time
+import logging
+
+import numpy as np
+
+from modules.emotion_detector import MOOD_LABELS, FaceTracker, detect_batch
+
+logger = logging.getLogger('vibefy')
+
+
+def iter_video_frames(path, stride=5, start_seconds=0.0, end_seconds=None):
+    """
+    Lazily decode every `stride`-th frame of a video file, starting at
+    `start_seconds`. Skipped frames are only grabbed, never decoded into
+    images, and only one frame is held at a time.
+    Yields (frame_index, timestamp_seconds, BGR frame).
+    """
+    import cv2
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video: {path}")
+
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        if start_seconds:
+            cap.set(cv2.CAP_PROP_POS_MSEC, start_seconds * 1000.0)
+        first_index = index = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+
+        while True:
+            timestamp = index / fps
+            if end_seconds is not None and timestamp > end_seconds:
+                break
+            if (index - first_index) % stride == 0:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                yield index, timestamp, frame
+            elif not cap.grab():
+                break
+            index += 1
+    finally:
+        cap.release()
+
+
+def video_info(path):
+    """Frame rate, frame count and duration of a video file"""
+    import cv2
+
+    cap = cv2.VideoCapture(path)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        return {"fps": fps, "frames": frame_count, "seconds": frame_count / fps if fps else 0.0}
+    finally:
+        cap.release()
+
+
+def _segment_summary(start, end, frames, distributions):
+    summary = {"start": start, "end": end, "frames": frames, "faces": len(distributions),
+               "mood": None, "confidence": 0.0, "probabilities": None}
+    if distributions:
+        mean = np.mean(distributions, axis=0)
+        idx = int(np.argmax(mean))
+        summary.update(mood=MOOD_LABELS[idx], confidence=float(mean[idx]), probabilities=mean)
+    return summary
+
+
+def emotion_timeline(path, stride=5, segment_seconds=1.0, batch_size=8, start_seconds=0.0,
+                     end_seconds=None, detector=None, emotion_backend=None, track=True):
+    """
+    Stream an emotion timeline for a video file. Sampled frames are classified
+    `batch_size` at a time and their probability vectors are averaged over
+    fixed `segment_seconds` windows. Memory stays bounded by one batch.
+    Yields one summary per segment: {"start", "end", "frames", "faces",
+    "mood", "confidence", "probabilities"} (mood is None when no face was seen).
+    """
+    tracker = FaceTracker(detector=detector) if track else None
+    started = time.perf_counter()
+    sampled = 0
+
+    segment_start = start_seconds
+    segment_frames = 0
+    segment_distributions = []
+    batch = []
+
+    def classify(batch):
+        results = detect_batch([frame for _, frame in batch], tracker=tracker,
+                               detector=detector, emotion_backend=emotion_backend)
+        return [(timestamp, result) for (timestamp, _), result in zip(batch, results)]
+
+    def fold(classified):
+        """Add classified frames to the current segment, yielding segments that are complete"""
+        nonlocal segment_start, segment_frames, segment_distributions
+        for timestamp, result in classified:
+            while timestamp >= segment_start + segment_seconds:
+                yield _segment_summary(segment_start, segment_start + segment_seconds,
+                                       segment_frames, segment_distributions)
+                segment_start += segment_seconds
+                segment_frames = 0
+                segment_distributions = []
+            segment_frames += 1
+            if result.get("probabilities") is not None:
+                segment_distributions.append(result["probabilities"])
+
+    for _, timestamp, frame in iter_video_frames(path, stride, start_seconds, end_seconds):
+        batch.append((timestamp, frame))
+        sampled += 1
+        if len(batch) >= batch_size:
+            yield from fold(classify(batch))
+            batch = []
+
+    if batch:
+        yield from fold(classify(batch))
+    if segment_frames:
+        yield _segment_summary(segment_start, segment_start + segment_seconds,
+                               segment_frames, segment_distributions)
+
+    elapsed = time.perf_counter() - started
+    rate = sampled / elapsed if elapsed > 0 else 0.0
+    logger.info(f"Video timeline for {path}: {sampled} frame(s) in {elapsed:.1f}s ({rate:.1f} fps)")
+    if tracker is not None:
+        logger.info(f"Video face tracker stats: {tracker.stats()}")
+
+
+def overall_mood(segments):
+    """Face-count-weighted average of segment distributions as {"mood", "confidence", "probabilities"}"""
+    weighted = [(s["probabilities"], s["faces"]) for s in segments if s["probabilities"] is not None]
+    if not weighted:
+        return None
+    distribution = np.average([p for p, _ in weighted], axis=0, weights=[w for _, w in weighted])
+    idx = int(np.argmax(distribution))
+    return {"mood": MOOD_LABELS[idx], "confidence": float(distribution[idx]), "probabilities": distribution}
@@ -3,20 +3,27 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import streamlit as st
-from modules.emotion_detector import detect_from_face, analyze_text, get_emotion_description
+from modules.emotion_detector import detect_batch, get_inference_pool, FaceTracker, FrameGate, MoodAggregator, MOOD_LABELS, analyze_text, get_emotion_description, start_hf_warmup
 from modules.themes import apply_mood_theme, display_mood_confirmation
-import tempfile
-import cv2
+from modules.camera_capture import CameraCapture, InferenceWorker, DROP_OLDEST
 import numpy as np
 import time
-from collections import Counter
-from statistics import mean
+import tempfile
+from functools import partial
 import logging
 import traceback
 from datetime import datetime
 from modules.themes import apply_default_theme
 
+# Page configuration (must be the first Streamlit call)
+st.set_page_config(
+    page_title="Detect Your Mood - Vibefy",
+    page_icon="😊",
+    layout="wide"
+)
+
 apply_default_theme()
+start_hf_warmup()
 
 
 # Set up logging configuration
@@ -43,12 +50,33 @@ logger.addHandler(console_handler)
 logger.info(f"Mood detection page loaded by user: {os.getenv('USERNAME', 'unknown')}")
 logger.info(f"Current UTC time: {datetime.utcnow().strftime('%Y-%m-%D %H:%M:%S')}")
 
-# Page configuration
-st.set_page_config(
-    page_title="Detect Your Mood - Vibefy",
-    page_icon="😊",
-    layout="wide"
-)
+# Camera pipeline: a grabber thread fills a small preview buffer and takes a
+# sample every SAMPLE_INTERVAL seconds; an inference worker classifies the
+# samples BATCH_SIZE at a time
+RECORDING_SECONDS = 5
+SAMPLE_INTERVAL = 0.5
+MAX_SAMPLES = 10
+BATCH_SIZE = 5
+PREVIEW_INTERVAL = 1 / 15
+# Stop recording once the running distribution's leader is this far ahead
+EARLY_STOP_MARGIN = float(os.getenv("VIBEFY_EARLY_STOP_MARGIN", "0.25"))
+
+# Video timeline: analyse every VIDEO_STRIDE-th frame, one point per VIDEO_SEGMENT_SECONDS
+VIDEO_STRIDE = int(os.getenv("VIBEFY_VIDEO_STRIDE", "5"))
+VIDEO_SEGMENT_SECONDS = float(os.getenv("VIBEFY_VIDEO_SEGMENT_SECONDS", "1.0"))
+FRAME_BUFFER_SIZE = int(os.getenv("VIBEFY_FRAME_BUFFER_SIZE", "2"))
+SAMPLE_QUEUE_DEPTH = int(os.getenv("VIBEFY_SAMPLE_QUEUE_DEPTH", str(MAX_SAMPLES)))
+DROP_POLICY = os.getenv("VIBEFY_DROP_POLICY", DROP_OLDEST)
+# Detect the face once and track it across samples instead of re-running MTCNN
+FACE_TRACKING = os.getenv("VIBEFY_FACE_TRACKING", "1") == "1"
+# Reuse the previous result when a sample is nearly identical to the last one analysed
+FRAME_GATE = os.getenv("VIBEFY_FRAME_GATE", "1") == "1"
+
+
+def is_usable_result(mood_result):
+    """Skip the neutral/0.0 fallback returned when no face was found"""
+    return bool(mood_result) and (mood_result.get("mood") != "neutral" or mood_result.get("confidence", 0) > 0)
+
 
 # Initialize session state variables
 logger.debug("Initializing session state variables")
@@ -87,7 +115,7 @@ st.write("Choose how you'd like to share your emotional state with Vibefy")
 st.markdown("### Choose Your Detection Method")
 option = st.radio(
     "Select one:",
-    ["📷 Camera", "✍️ Text", "🎯 Manual"],
+    ["📷 Camera", "🎞️ Video", "✍️ Text", "🤳 Photo + Text", "🎯 Manual"],
     horizontal=True,
     label_visibility="collapsed"
 )
@@ -98,7 +126,7 @@ st.divider()
 if option == "📷 Camera":
     logger.info("User selected camera detection method")
     st.markdown("### 📷 Camera Detection")
-    st.info("🎥 Position your face in the camera and click 'Start Recording' to capture your emotion over 5 seconds.")
+    st.info(f"🎥 Position your face in the camera and click 'Start Recording' to capture your emotion over {RECORDING_SECONDS} seconds.")
     
     col1, col2, col3 = st.columns([1, 2, 1])
     
@@ -118,87 +146,98 @@ if option == "📷 Camera":
 
     if st.session_state.recording:
         logger.debug("Camera recording in progress")
+        # Imported here so the Text and Manual methods never load OpenCV
+        import cv2
         try:
-            cap = cv2.VideoCapture(0)
+            capture = CameraCapture(
+                device=0,
+                width=640,
+                height=480,
+                fps=30,
+                resize=(400, 300),
+                buffer_size=FRAME_BUFFER_SIZE,
+                drop_policy=DROP_POLICY,
+                sample_interval=SAMPLE_INTERVAL,
+                max_samples=MAX_SAMPLES,
+                sample_queue_depth=SAMPLE_QUEUE_DEPTH,
+                sample_drop_policy=DROP_POLICY,
+            )
             
-            if not cap.isOpened():
-                logger.error("Failed to open webcam")
+            if not capture.start():
                 st.error("❌ Unable to access webcam. Please check your camera permissions.")
                 st.session_state.recording = False
             else:
-                logger.debug("Webcam opened successfully")
-                # Camera configuration
-                cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-                cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-                cap.set(cv2.CAP_PROP_FPS, 30)
+                tracker = FaceTracker() if FACE_TRACKING else None
+                gate = FrameGate() if FRAME_GATE else None
+                # Use the shared process pool when VIBEFY_INFERENCE_WORKERS is set
+                pool = get_inference_pool()
+                detect_fn = pool.detect_batch if pool is not None else detect_batch
+                worker = InferenceWorker(capture.samples, partial(detect_fn, tracker=tracker, gate=gate), batch_size=BATCH_SIZE)
+                worker.start()
                 
                 status_placeholder = st.empty()
                 status_placeholder.warning("🔴 Recording in progress... Keep your face visible!")
                 
                 frame_placeholder = st.empty()
                 start_time = time.time()
-                last_capture = 0
-                frames_processed = 0
+                aggregator = MoodAggregator(margin=EARLY_STOP_MARGIN)
+                results_seen = 0
+                stopped_early = False
                 
-                while st.session_state.recording and (time.time() - start_time) < 5:
-                    ret, frame = cap.read()
-                    
-                    if not ret:
-                        logger.error("Failed to capture frame from camera")
+                def consume_results():
+                    """Fold newly finished samples into the running mood estimate"""
+                    global results_seen
+                    new_results = worker.results()[results_seen:]
+                    results_seen += len(new_results)
+                    for mood_result in new_results:
+                        if is_usable_result(mood_result):
+                            aggregator.update(mood_result)
+                    return bool(new_results)
+                
+                # The script thread only renders; grabbing and inference run on background threads
+                while st.session_state.recording and (time.time() - start_time) < RECORDING_SECONDS:
+                    if capture.error:
                         st.error("❌ Failed to capture frame from camera")
                         break
                     
-                    frame = cv2.resize(frame, (400, 300))
-                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    frame_rgb = cv2.flip(frame_rgb, 1)
-                    frame_placeholder.image(frame_rgb, channels="RGB", width=400)
+                    frame = capture.latest_frame()
+                    if frame is not None:
+                        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                        frame_rgb = cv2.flip(frame_rgb, 1)
+                        frame_placeholder.image(frame_rgb, channels="RGB", width=400)
                     
-                    current_time = time.time()
-                    if current_time - last_capture >= 1.0 and frames_processed < 5:
-                        try:
-                            logger.debug(f"Processing frame {frames_processed + 1}")
-                            with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as temp_file:
-                                cv2.imwrite(temp_file.name, frame)
-                                temp_path = temp_file.name
-                            
-                            mood_result = detect_from_face(temp_path)
-                            logger.debug(f"Frame {frames_processed + 1} mood result: {mood_result}")
-                            
-                            if mood_result and (mood_result.get("mood") != "neutral" or mood_result.get("confidence", 0) > 0):
-                                st.session_state.captured_results.append(mood_result)
-                                status_placeholder.info(f"📸 Captured {len(st.session_state.captured_results)}/5: {mood_result.get('mood')} ({mood_result.get('confidence'):.0%})")
-                            
-                            os.unlink(temp_path)
-                            last_capture = current_time
-                            frames_processed += 1
-                        except Exception as e:
-                            logger.exception(f"Error processing frame {frames_processed + 1}")
-                            st.error(f"Error processing frame: {str(e)}")
+                    if consume_results() and aggregator.samples:
+                        estimate = aggregator.result()
+                        status_placeholder.info(f"📸 Captured {aggregator.samples}/{MAX_SAMPLES}: {estimate['mood']} ({estimate['confidence']:.0%})")
+                    
+                    if aggregator.is_confident():
+                        logger.info(f"Stopping early after {time.time() - start_time:.1f}s (margin {aggregator.leading_margin():.2f})")
+                        stopped_early = True
+                        break
                     
-                    time.sleep(0.01)
+                    time.sleep(PREVIEW_INTERVAL)
                 
-                cap.release()
+                capture.stop()
+                worker.stop(drain=not stopped_early)
+                consume_results()
                 st.session_state.recording = False
+                st.session_state.captured_results = [r for r in worker.results() if is_usable_result(r)]
+                logger.info(f"Capture pipeline stats: camera={capture.stats()} inference={worker.stats()}")
+                if tracker is not None:
+                    logger.info(f"Face tracker stats: {tracker.stats()}")
+                if gate is not None:
+                    logger.info(f"Frame gate stats: {gate.stats()}")
                 
                 # Process results
-                if st.session_state.captured_results:
-                    logger.info("Processing captured results")
-                    moods = [r["mood"] for r in st.session_state.captured_results]
-                    if moods:
-                        most_common_mood, count = Counter(moods).most_common(1)[0]
-                        same_mood_results = [r for r in st.session_state.captured_results if r["mood"] == most_common_mood]
-                        avg_conf = mean([r.get("confidence", 0.0) for r in same_mood_results])
-                        
-                        logger.info(f"Final mood detection: {most_common_mood} with confidence {avg_conf:.2f}")
-                        st.session_state.mood = most_common_mood
-                        st.session_state.confidence = avg_conf
-                        st.session_state.mood_confirmed = True
-                        
-                        status_placeholder.empty()
-                        st.rerun()
-                    else:
-                        logger.warning("No clear emotion detected")
-                        status_placeholder.warning("⚠️ No clear emotion detected. Please try again with better lighting.")
+                final = aggregator.result()
+                if final:
+                    logger.info(f"Final mood detection: {final['mood']} with confidence {final['confidence']:.2f}")
+                    st.session_state.mood = final["mood"]
+                    st.session_state.confidence = final["confidence"]
+                    st.session_state.mood_confirmed = True
+                    
+                    status_placeholder.empty()
+                    st.rerun()
                 else:
                     logger.warning("No emotions detected")
                     status_placeholder.warning("⚠️ No emotions detected. Please ensure your face is clearly visible.")
@@ -208,45 +247,183 @@ if option == "📷 Camera":
             st.error(f"❌ Camera error: {str(e)}")
             st.session_state.recording = False
 
+# VIDEO DETECTION
+elif option == "🎞️ Video":
+    logger.info("User selected video detection method")
+    st.markdown("### 🎞️ Video Analysis")
+    st.info("🎬 Upload a short video clip of your face and we'll chart how your emotions change over time.")
+    
+    uploaded_video = st.file_uploader("Upload a video", type=["mp4", "mov", "avi", "webm", "mkv"])
+    
+    if uploaded_video is not None and st.button("🔍 Analyze Video", use_container_width=True, type="primary"):
+        from modules.video_timeline import emotion_timeline, overall_mood, video_info
+        
+        # OpenCV needs a file path to decode from
+        suffix = os.path.splitext(uploaded_video.name)[1] or ".mp4"
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+            temp_file.write(uploaded_video.getbuffer())
+            video_path = temp_file.name
+        
+        try:
+            duration = video_info(video_path)["seconds"]
+            progress = st.progress(0.0, text="Analyzing video...")
+            chart_placeholder = st.empty()
+            segments = []
+            
+            for segment in emotion_timeline(video_path, stride=VIDEO_STRIDE, segment_seconds=VIDEO_SEGMENT_SECONDS):
+                segments.append(segment)
+                if duration:
+                    progress.progress(min(1.0, segment["end"] / duration), text=f"Analyzed {segment['end']:.0f}s of {duration:.0f}s")
+                chart_placeholder.line_chart({
+                    mood: [float(s["probabilities"][i]) if s["probabilities"] is not None else 0.0 for s in segments]
+                    for i, mood in enumerate(MOOD_LABELS)
+                })
+            
+            progress.empty()
+            final = overall_mood(segments)
+            if final:
+                logger.info(f"Video mood detection: {final['mood']} with confidence {final['confidence']:.2f}")
+                st.session_state.mood = final["mood"]
+                st.session_state.confidence = final["confidence"]
+                st.session_state.mood_confirmed = True
+            else:
+                logger.warning("No faces found in video")
+                st.warning("⚠️ No faces found in the video. Please ensure your face is clearly visible.")
+        except Exception as e:
+            logger.exception("Video analysis failed")
+            st.error(f"❌ Video analysis failed: {str(e)}")
+        finally:
+            os.unlink(video_path)
+
 # TEXT DETECTION
 elif option == "✍️ Text":
     logger.info("User selected text detection method")
     st.markdown("### ✍️ Text Analysis")
     st.info("📝 Describe how you're feeling in your own words. Our AI will analyze the emotion in your text.")
     
-    # Use a form to handle text input
-    with st.form("text_analysis_form"):
-        user_text = st.text_area(
+    live_preview = st.toggle("⚡ Live preview", help="Update the mood estimate as you write, re-analyzing only the sentences you changed")
+    
+    if live_preview:
+        from modules.live_preview import LiveMoodPreview
+    
+        if "live_preview" not in st.session_state:
+            st.session_state.live_preview = LiveMoodPreview()
+        preview = st.session_state.live_preview
+    
+        live_text = st.text_area(
             "How are you feeling right now?",
-            placeholder="Example: I'm feeling overwhelmed with work and a bit anxious about the deadline...",
+            placeholder="Write a sentence or two, then press Ctrl+Enter or click outside the box to update the preview...",
             height=150,
-            key="text_input"
+            key="live_text_input"
         )
+    
+        if live_text.strip():
+            # Streamlit only sends the text on Ctrl+Enter or blur, so every rerun
+            # is a deliberate edit; the sentence memo keeps it cheap, no debounce needed
+            try:
+                estimate = preview.update(live_text, force=True)
+            except Exception as e:
+                logger.exception("Live preview failed")
+                estimate = None
+        
+            if estimate and estimate["confidence"] > 0:
+                st.markdown(f"**Live estimate:** {estimate['mood'].capitalize()} ({estimate['confidence']:.0%})")
+                st.caption(f"Re-analyzed {estimate['rescored']} of {estimate['sentences']} sentence(s)")
+                st.bar_chart({"mood": list(MOOD_LABELS), "probability": [float(p) for p in estimate["probabilities"]]},
+                             x="mood", y="probability")
+            
+                if st.button("✅ Use This Mood", use_container_width=True, type="primary"):
+                    logger.info(f"Live preview mood confirmed: {estimate['mood']} ({estimate['confidence']:.2f}), stats: {preview.stats()}")
+                    st.session_state.mood = estimate["mood"]
+                    st.session_state.confidence = estimate["confidence"]
+                    st.session_state.user_input = live_text
+                    st.session_state.mood_confirmed = True
+                    st.rerun()
+            else:
+                st.caption("Keep writing, no clear mood yet...")
+    
+    else:
+        # Use a form to handle text input
+        with st.form("text_analysis_form"):
+            user_text = st.text_area(
+                "How are you feeling right now?",
+                placeholder="Example: I'm feeling overwhelmed with work and a bit anxious about the deadline...",
+                height=150,
+                key="text_input"
+            )
         
-        submit_button = st.form_submit_button(
-            "🔍 Analyze My Feelings",
+            submit_button = st.form_submit_button(
+                "🔍 Analyze My Feelings",
+                use_container_width=True,
+                type="primary"
+            )
+    
+        if submit_button:
+            if user_text.strip():
+                with st.spinner("Analyzing your text..."):
+                    try:
+                        logger.info(f"Analyzing text: {user_text[:50]}...")
+                        mood_result = analyze_text(user_text)
+                        logger.debug(f"Text analysis result: {mood_result}")
+                    
+                        st.session_state.mood = mood_result.get("mood")
+                        st.session_state.confidence = mood_result.get("confidence")
+                        st.session_state.user_input = user_text
+                        st.session_state.mood_confirmed = True
+                        st.rerun()
+                    except Exception as e:
+                        logger.exception("Text analysis failed")
+                        st.error("Text analysis failed. Please try again or check vibefy_debug.log")
+            else:
+                st.warning("⚠️ Please enter some text describing your feelings.")
+
+# PHOTO + TEXT DETECTION
+elif option == "🤳 Photo + Text":
+    logger.info("User selected combined photo and text detection method")
+    st.markdown("### 🤳 Photo + Text")
+    st.info("📸 Take a photo and describe how you feel. Both are analyzed at the same time and combined into one mood.")
+    
+    with st.form("multimodal_form"):
+        photo = st.camera_input("Take a photo")
+        combined_text = st.text_area(
+            "How are you feeling right now?",
+            placeholder="Example: Long day, but I just got some great news...",
+            height=100,
+            key="multimodal_text"
+        )
+        combined_submit = st.form_submit_button(
+            "🔍 Analyze Photo + Text",
             use_container_width=True,
             type="primary"
         )
     
-    if submit_button:
-        if user_text.strip():
-            with st.spinner("Analyzing your text..."):
+    if combined_submit:
+        if photo is None and not combined_text.strip():
+            st.warning("⚠️ Please take a photo, write some text, or both.")
+        else:
+            from modules.multimodal import detect_multimodal_sync
+            
+            with st.spinner("Analyzing your photo and text..."):
                 try:
-                    logger.info(f"Analyzing text: {user_text[:50]}...")
-                    mood_result = analyze_text(user_text)
-                    logger.debug(f"Text analysis result: {mood_result}")
+                    mood_result = detect_multimodal_sync(
+                        image=photo.getvalue() if photo is not None else None,
+                        text=combined_text if combined_text.strip() else None,
+                    )
+                    for name, modality in mood_result["modalities"].items():
+                        found = modality["result"] or {}
+                        st.caption(f"{name.capitalize()}: {found.get('mood', '-')} "
+                                   f"({found.get('confidence', 0.0):.0%}, {modality['status']}, {modality['seconds']:.1f}s)")
                     
-                    st.session_state.mood = mood_result.get("mood")
-                    st.session_state.confidence = mood_result.get("confidence")
-                    st.session_state.user_input = user_text
-                    st.session_state.mood_confirmed = True
-                    st.rerun()
+                    if mood_result["confidence"] > 0:
+                        st.session_state.mood = mood_result["mood"]
+                        st.session_state.confidence = mood_result["confidence"]
+                        st.session_state.user_input = combined_text
+                        st.session_state.mood_confirmed = True
+                    else:
+                        st.warning("⚠️ Couldn't detect a mood. Make sure your face is visible or add more text.")
                 except Exception as e:
-                    logger.exception("Text analysis failed")
-                    st.error("Text analysis failed. Please try again or check vibefy_debug.log")
-        else:
-            st.warning("⚠️ Please enter some text describing your feelings.")
+                    logger.exception("Combined photo and text analysis failed")
+                    st.error("Analysis failed. Please try again or check vibefy_debug.log")
 
 # MANUAL DETECTION
 elif option == "🎯 Manual":